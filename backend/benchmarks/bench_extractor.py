@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Stage-level benchmark for TaskExtractor.
+
+Runs a generated corpus through the extractor and reports throughput,
+per-text latency percentiles and the time spent in each stage the
+extractor times for the nlp_stage_seconds metric, from the spaCy parse to
+the rule stages. Results can be saved as a JSON baseline and later
+compared against it:
+
+    python benchmarks/bench_extractor.py --save
+    python benchmarks/bench_extractor.py --compare --threshold 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+
+# Add the backend directory to the path to access modules
+backend_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(backend_root)
+
+import spacy
+import nlp.nlp as nlp_module
+from nlp.cache import ResultCache
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+DEFAULT_BASELINE = os.path.join(BASELINE_DIR, "extractor.json")
+
+# Fixed reference time so relative dates resolve the same way on every run
+REFERENCE = datetime(2025, 1, 6, 9, 0)
+
+ACTIONS = ["dentist appointment", "gym workout", "pick up groceries", "call mom", "review the budget",
+           "submit the report", "plan birthday party", "study for the midterm", "coffee", "team meeting"]
+PARTICIPANTS = ["with John", "with Sarah and Tim", "with Ashley", "with the team", "with Dr. Smith"]
+LOCATIONS = ["at the library", "at Starbucks", "in the conference room", "near the quad", "at Cafe Nero"]
+DATES = ["tomorrow", "today", "on Friday", "next Monday", "next week", "on Sunday"]
+TIMES = ["at 3pm", "at 6am", "at 10:30am", "at noon", "by midnight", "at 7 pm"]
+RANGES = ["from 10AM to 4PM", "between 9am and 10:30am", "2pm to 5pm"]
+FILLER = ["and remember to bring the notes", "before the deadline", "to go over the slides",
+          "regarding the project update", "so we can finalize everything"]
+
+
+def generate_corpus(size, seed=0):
+    """Generate task texts covering short/long inputs, ranges, participants and locations."""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(size):
+        parts = [rng.choice(ACTIONS)]
+        if i % 2:
+            parts.append(rng.choice(PARTICIPANTS))
+        if (i // 2) % 2:
+            parts.append(rng.choice(LOCATIONS))
+        parts.append(rng.choice(DATES))
+        parts.append(rng.choice(RANGES) if (i // 4) % 2 else rng.choice(TIMES))
+        # Every other block of eight is a long text
+        if (i // 8) % 2:
+            parts.extend(rng.sample(FILLER, 2))
+        corpus.append(" ".join(parts))
+    return corpus
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+class StageTimer:
+    """Accumulates wall time per stage name."""
+
+    def __init__(self):
+        self.totals = {}
+
+    def wrap(self, name, func):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.totals[name] = self.totals.get(name, 0.0) + time.perf_counter() - start
+        return timed
+
+    def wrap_stages(self, timed):
+        """Wrap TaskExtractor._timed, so every stage the extractor times is recorded here too."""
+        def wrapped(stage, func, *args):
+            return self.wrap(stage, timed)(stage, func, *args)
+        return wrapped
+
+
+def run_benchmark(corpus, mode="full", batch_size=nlp_module.DEFAULT_BATCH_SIZE, repeat=1):
+    """Benchmark single-text and batch extraction over the corpus."""
+    timer = StageTimer()
+    # A fresh extractor with the result cache off, so every text is really extracted
+    extractor = nlp_module.TaskExtractor(mode=mode, cache=ResultCache(capacity=0))
+    extractor._timed = timer.wrap_stages(extractor._timed)
+
+    # Warm up the pipeline and regex caches
+    extractor.extract_many(corpus[:16], batch_size=batch_size, reference=REFERENCE)
+    timer.totals.clear()
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in corpus:
+            text_start = time.perf_counter()
+            extractor.extract_from_text(text, reference=REFERENCE)
+            latencies.append(time.perf_counter() - text_start)
+    single_elapsed = time.perf_counter() - start
+    single_stages = dict(timer.totals)
+
+    timer.totals.clear()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        extractor.extract_many(corpus, batch_size=batch_size, reference=REFERENCE)
+    batch_elapsed = time.perf_counter() - start
+    batch_stages = dict(timer.totals)
+
+    count = len(corpus) * repeat
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "spacy": spacy.__version__,
+            "model": f"{nlp_module.nlp.meta.get('name')}-{nlp_module.nlp.meta.get('version')}",
+            "mode": mode,
+            "texts": count,
+            "batch_size": batch_size,
+        },
+        "single": {
+            "throughput": count / single_elapsed,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "stages": summarize_stages(single_stages, single_elapsed, count),
+        },
+        "batch": {
+            "throughput": count / batch_elapsed,
+            "stages": summarize_stages(batch_stages, batch_elapsed, count),
+        },
+    }
+
+
+def summarize_stages(totals, elapsed, count):
+    return {
+        name: {
+            "total_ms": seconds * 1000,
+            "per_text_ms": seconds * 1000 / count,
+            "share": seconds / elapsed if elapsed else 0.0,
+        }
+        for name, seconds in sorted(totals.items(), key=lambda item: -item[1])
+    }
+
+
+def print_report(report):
+    meta = report["meta"]
+    print(f"=== TaskExtractor benchmark ({meta['texts']} texts, mode={meta['mode']}, model={meta['model']}) ===")
+    single = report["single"]
+    print(f"Single: {single['throughput']:.1f} texts/s  "
+          f"p50 {single['p50_ms']:.2f} ms  p95 {single['p95_ms']:.2f} ms  p99 {single['p99_ms']:.2f} ms")
+    print(f"Batch:  {report['batch']['throughput']:.1f} texts/s")
+    print("\nTime per stage (single-text run):")
+    for name, stage in single["stages"].items():
+        print(f"  {name:<28} {stage['per_text_ms']:8.3f} ms/text  {stage['share'] * 100:5.1f}%")
+
+
+def compare(report, baseline, threshold):
+    """Return a list of regressions beyond threshold (a fraction, e.g. 0.1)."""
+    regressions = []
+    for run in ("single", "batch"):
+        old = baseline[run]["throughput"]
+        new = report[run]["throughput"]
+        change = (new - old) / old
+        print(f"{run:<6} throughput {old:10.1f} -> {new:10.1f} texts/s ({change * 100:+.1f}%)")
+        if change < -threshold:
+            regressions.append(f"{run} throughput dropped {-change * 100:.1f}% (limit {threshold * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TaskExtractor stages")
+    parser.add_argument("--size", type=int, default=400, help="Number of generated texts")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus generator seed")
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over the corpus")
+    parser.add_argument("--mode", choices=nlp_module.EXTRACTION_MODES, default="full")
+    parser.add_argument("--batch-size", type=int, default=nlp_module.DEFAULT_BATCH_SIZE)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="Store the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Compare against the baseline")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Allowed throughput drop before --compare fails (fraction)")
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.size, args.seed)
+    report = run_benchmark(corpus, mode=args.mode, batch_size=args.batch_size, repeat=args.repeat)
+    print_report(report)
+
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nComparing with {args.baseline}:")
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            for regression in regressions:
+                print(f"REGRESSION: {regression}")
+            sys.exit(1)
+        print("No regressions.")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"\nBaseline saved to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
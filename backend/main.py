@@ -1,8 +1,18 @@
 from fastapi import FastAPI, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import uvicorn
 import argparse
 from routers.nlp_events import router as nlp_router
+from nlp.nlp import extractor, EXTRACTION_MODES
+from services.executor import executor
+from services.batcher import batcher
+from services.jobs import job_manager
+from services.live import live_sessions
+from services.persistence import result_writer, PERSIST_MODES
+from utils.metrics import registry
+from utils.prefork import PreforkServer
+from utils.request_metrics import RequestMetricsMiddleware
 
 app = FastAPI(
     title="NLP Task Manager",
@@ -22,15 +32,75 @@ app.add_middleware(
 # Include routers
 app.include_router(nlp_router, prefix="/nlp")
 
+# Request latency and status per route, timed up to the last byte of streamed responses
+app.add_middleware(RequestMetricsMiddleware)
+
+@app.on_event("startup")
+async def start_executor():
+    # Load the model in the worker processes before the first request arrives
+    executor.start()
+    result_writer.start()
+
+@app.on_event("shutdown")
+async def stop_executor():
+    job_manager.shutdown()
+    executor.shutdown()
+    # Flush results that are still waiting to be written
+    result_writer.stop()
+
 @app.get("/")
 async def root():
     return {"message": "NLP Task Manager API is running"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics for extraction stages, caches and routes"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="NLP Task Manager")
     parser.add_argument("--server", action="store_true", help="Run as server")
     parser.add_argument("--port", type=int, default=8080, help="Port to run server on")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Server processes forked from one master that loads the model once")
+    parser.add_argument("--max-requests", type=int, default=0,
+                        help="Requests a worker serves before it is replaced (0 never recycles)")
+    parser.add_argument("--pool-size", type=int, default=executor.pool_size,
+                        help="Number of extraction worker processes (0 runs extraction in a thread)")
+    parser.add_argument("--queue-depth", type=int, default=executor.queue_depth,
+                        help="Maximum number of extraction jobs pending at once")
+    parser.add_argument("--batch-window-ms", type=float, default=batcher.window_ms,
+                        help="How long concurrent requests are collected into one batch (0 disables coalescing)")
+    parser.add_argument("--max-batch-size", type=int, default=batcher.max_batch_size,
+                        help="Texts per coalesced batch before it is sent without waiting")
+    parser.add_argument("--job-concurrency", type=int, default=job_manager.concurrency,
+                        help="Background jobs extracted at the same time")
+    parser.add_argument("--job-ttl", type=float, default=job_manager.ttl,
+                        help="Seconds finished jobs and their results are kept (0 keeps them)")
+    parser.add_argument("--live-debounce-ms", type=float, default=live_sessions.debounce_ms,
+                        help="How long a live preview edit waits for a newer one before it is extracted")
+    parser.add_argument("--extraction-mode", choices=EXTRACTION_MODES, default=extractor.mode,
+                        help="Server-wide extraction mode; 'fast' skips the spaCy parse for simple inputs")
+    parser.add_argument("--persist", choices=PERSIST_MODES, default=result_writer.mode,
+                        help="How results are saved: overwrite output.json, append to output.jsonl, or off")
+    parser.add_argument("--output-file", default=None, help="File results are persisted to")
     args = parser.parse_args()
+    extractor.mode = args.extraction_mode
+    result_writer.configure(args.persist, args.output_file)
+    executor.pool_size = args.pool_size
+    executor.queue_depth = args.queue_depth
+    batcher.window_ms = args.batch_window_ms
+    batcher.max_batch_size = args.max_batch_size
+    job_manager.concurrency = args.job_concurrency
+    job_manager.ttl = args.job_ttl
+    live_sessions.debounce_ms = args.live_debounce_ms
 
-    if args.server:
+    if args.server and args.workers > 1:
+        # Each worker process already handles requests in parallel with the
+        # others, so extraction runs in a thread of the worker
+        executor.pool_size = 0
+        PreforkServer(app, host="127.0.0.1", port=args.port, workers=args.workers,
+                      max_requests=args.max_requests,
+                      warm_up=lambda: extractor.extract_from_text("warm up the pipeline tomorrow in 2 hours")).run()
+    elif args.server:
         uvicorn.run(app, host="127.0.0.1", port=args.port) 
\ No newline at end of file
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from pydantic import BaseModel
 from typing import List, Optional
 
@@ -10,6 +11,35 @@ class TaskEvent(BaseModel):
     participants: List[str] = []
     locations: List[str] = []
 
+@dataclass
+class ExtractedTask:
+    """
+    Compact result of extracting one task. Fields are stored in slots and
+    serialize in the same order as the result dicts built by TaskExtractor.
+    """
+    __slots__ = ("task", "participants", "date", "time", "end_time", "locations", "extraction_path")
+    task: Optional[str]
+    participants: List[str]
+    date: Optional[str]
+    time: Optional[str]
+    end_time: Optional[str]
+    locations: List[str]
+    extraction_path: Optional[str]
+
+    @classmethod
+    def from_dict(cls, data):
+        get = data.get
+        return cls(get("task"), get("participants", []), get("date"), get("time"), get("end_time"),
+                   get("locations", []), get("extraction_path"))
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def to_task_event(self):
+        """The TaskEvent to turn this result into a calendar event."""
+        return TaskEvent(task=self.task or "", date=self.date, time=self.time, end_time=self.end_time,
+                         participants=list(self.participants), locations=list(self.locations))
+
 class EventResponse(BaseModel):
     """Model for calendar event response"""
     event_id: str
@@ -17,4 +47,15 @@ class EventResponse(BaseModel):
     summary: str
     start: dict
     end: dict
-    status: str 
\ No newline at end of file
+    status: str 
+
+
+def typed_result(parsed):
+    """
+    The typed form of an extraction result: an ExtractedTask, or in "segment"
+    mode one {"text", "start", "end", "extracted_entities"} record per task.
+    """
+    if isinstance(parsed, list):
+        return [{"text": item["text"], "start": item["start"], "end": item["end"],
+                 "extracted_entities": ExtractedTask.from_dict(item)} for item in parsed]
+    return ExtractedTask.from_dict(parsed)
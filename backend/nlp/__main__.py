@@ -0,0 +1,84 @@
+"""
+Bulk extraction from the command line, sharded across worker processes:
+
+    python -m nlp --jobs 8 --batch-size 64 tasks.jsonl results.jsonl
+    cat tasks.jsonl | python -m nlp - - > results.jsonl
+
+Input is JSONL (one {"text": ...} per line) or the {"tasks": [...]} JSON
+shape; "-" reads stdin (JSONL unless --format says otherwise). Output is
+one JSONL record per non-empty task, {"index", "original_text",
+"extracted_entities"}, in input order. Progress goes to stderr. An
+existing output file is appended to after its last complete record, so an
+interrupted run picks up where it stopped; --restart overwrites it.
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+from nlp.nlp import DEFAULT_BATCH_SIZE, EXTRACTION_MODES, process_input_stream
+
+# Seconds between progress updates
+PROGRESS_INTERVAL = 0.5
+
+
+class Progress:
+    """Task count and throughput on stderr, rewritten in place on a terminal."""
+
+    def __init__(self, enabled=True, stream=sys.stderr):
+        self.enabled = enabled
+        self.stream = stream
+        self.tty = stream.isatty()
+        self.last = 0.0
+        self.line = None
+
+    def __call__(self, entries_done, written, elapsed):
+        self.line = f"{written} tasks, {written / elapsed if elapsed else 0:.1f} tasks/s, {elapsed:.1f}s"
+        if self.enabled and elapsed - self.last >= (PROGRESS_INTERVAL if self.tty else 10):
+            self.last = elapsed
+            self._show(final=False)
+
+    def finish(self):
+        if self.enabled and self.line:
+            self._show(final=True)
+
+    def _show(self, final):
+        if self.tty:
+            self.stream.write("\r" + self.line + ("\n" if final else ""))
+        else:
+            self.stream.write(self.line + "\n")
+        self.stream.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nlp", description="Extract tasks from a file in parallel")
+    parser.add_argument("input", nargs="?", default="-", help="JSON or JSONL task file, or - for stdin")
+    parser.add_argument("output", nargs="?", default="-", help="JSONL result file, or - for stdout")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes, each with its own copy of the model")
+    parser.add_argument("--batch-size", "-b", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Tasks per shard sent to a worker and parsed together")
+    parser.add_argument("--format", choices=("json", "jsonl"), default=None,
+                        help="Input format (default: from the file extension, JSONL for stdin)")
+    parser.add_argument("--mode", choices=EXTRACTION_MODES, default=None, help="Extraction mode")
+    parser.add_argument("--reference", default=None,
+                        help="ISO 8601 time relative dates are resolved against (default: now)")
+    parser.add_argument("--restart", action="store_true",
+                        help="Overwrite the output file instead of resuming after its last record")
+    parser.add_argument("--quiet", "-q", action="store_true", help="Do not report progress on stderr")
+    args = parser.parse_args(argv)
+
+    reference = datetime.fromisoformat(args.reference) if args.reference else None
+    progress = Progress(enabled=not args.quiet)
+    try:
+        ok = process_input_stream(args.input, args.output, resume=not args.restart, batch_size=args.batch_size,
+                                  reference=reference, input_format=args.format, progress=progress,
+                                  jobs=args.jobs, mode=args.mode)
+    except KeyboardInterrupt:
+        return 130
+    progress.finish()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from nlp.timescan import depends_on_time_of_day
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of cached extraction results (0 turns the cache off)
+CACHE_SIZE = int(os.getenv("NLP_CACHE_SIZE", "1024"))
+
+# Seconds a cached result stays valid (0 keeps entries until evicted)
+CACHE_TTL = float(os.getenv("NLP_CACHE_TTL", "3600"))
+
+# SQLite file of the persistent cache shared by all processes (unset disables it)
+DISK_CACHE_PATH = os.getenv("NLP_DISK_CACHE")
+
+# Maximum number of results kept on disk before the least recently used are evicted
+DISK_CACHE_SIZE = int(os.getenv("NLP_DISK_CACHE_SIZE", "100000"))
+
+# Seconds a result stays valid on disk (0: until evicted; the reference day in the key already bounds it)
+DISK_CACHE_TTL = float(os.getenv("NLP_DISK_CACHE_TTL", "0"))
+
+# Eviction runs once per this many writes rather than on every one
+_EVICT_EVERY = 256
+
+# A hit refreshes an entry's last use only if it is older than this many seconds,
+# and at most this many refreshes wait in memory for the next write
+_TOUCH_INTERVAL = 60
+_MAX_PENDING_TOUCHES = 10000
+
+CACHE_EVICTIONS = registry.counter("nlp_cache_evictions_total", "Results dropped from the in-memory cache to make room")
+CACHE_EXPIRATIONS = registry.counter("nlp_cache_expirations_total",
+                                     "Results dropped from the in-memory cache because their TTL ran out")
+DISK_CACHE_LOOKUPS = registry.counter("nlp_disk_cache_lookups_total", "Persistent result cache lookups",
+                                      labels=("result",))
+DISK_CACHE_EVICTIONS = registry.counter("nlp_disk_cache_evictions_total",
+                                        "Results dropped from the persistent cache to stay under its size")
+DISK_CACHE_ERRORS = registry.counter("nlp_disk_cache_errors_total", "Persistent result cache operations that failed",
+                                     labels=("action",))
+
+
+def normalize_text(text):
+    """Collapse runs of whitespace so trivially different inputs share a key."""
+    return " ".join(text.split())
+
+
+def cache_key(text, reference, mode):
+    """
+    Key for an extraction result. Relative dates change meaning at midnight,
+    so the reference day is part of the key; a duration such as "in 2 hours"
+    changes meaning every minute, so texts holding one key on the minute.
+    """
+    text = normalize_text(text)
+    if depends_on_time_of_day(text):
+        return (text, reference.isoformat(timespec="minutes"), mode)
+    return (text, reference.date().isoformat(), mode)
+
+
+def dedup_ratio(texts):
+    """Share of texts that repeat an earlier text once normalised (0.0 to 1.0)."""
+    if not texts:
+        return 0.0
+    return 1 - len({normalize_text(text) for text in texts}) / len(texts)
+
+
+def copy_result(result):
+    """Copy a result dict (or list of them) deep enough that callers cannot mutate the cached one."""
+    if isinstance(result, list):
+        return [copy_result(item) for item in result]
+    return {key: list(value) if isinstance(value, list) else value for key, value in result.items()}
+
+
+class DiskCache:
+    """
+    Persistent extraction results in a SQLite database, shared by every
+    process that points at the same file. Entries are keyed by a hash of
+    the cache key and the model/rules fingerprint, so results produced by
+    another model or rule set are never returned and simply age out.
+    The database runs in WAL mode so readers do not block the writer, and
+    each process opens its own connection on first use. Lookups never
+    write: the last use of a hit is recorded in memory and saved with the
+    next put, which is also the only time entries are evicted.
+    """
+
+    def __init__(self, path, fingerprint, capacity=DISK_CACHE_SIZE, ttl=DISK_CACHE_TTL):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.capacity = capacity
+        self.ttl = ttl
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._touches = {}
+
+    def _connect(self):
+        # Connections must not cross a fork, so a child process opens its own
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, result TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS results_used_at ON results (used_at)")
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def _hash(self, key):
+        return hashlib.sha256("\x1f".join((self.fingerprint,) + tuple(key)).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the stored result for key, or None."""
+        return self.get_many([key])[0]
+
+    def get_many(self, keys):
+        """Stored results for keys, in order, with None for misses (one query)."""
+        digests = [self._hash(key) for key in keys]
+        now = time.time()
+        found = {}
+        try:
+            with self._lock:
+                connection = self._connect()
+                placeholders = ",".join("?" * len(digests))
+                for digest, result, stored_at, used_at in connection.execute(
+                        f"SELECT key, result, stored_at, used_at FROM results WHERE key IN ({placeholders})",
+                        digests):
+                    if not (self.ttl and now - stored_at > self.ttl):
+                        found[digest] = result
+                        if now - used_at > _TOUCH_INTERVAL and len(self._touches) < _MAX_PENDING_TOUCHES:
+                            self._touches[digest] = now
+        except sqlite3.Error as e:
+            self._log_error("read", e)
+            found = {}
+        hits = sum(1 for digest in digests if digest in found)
+        DISK_CACHE_LOOKUPS.inc(hits, result="hit")
+        DISK_CACHE_LOOKUPS.inc(len(digests) - hits, result="miss")
+        return [json.loads(found[digest]) if digest in found else None for digest in digests]
+
+    def put(self, key, result):
+        self.put_many([(key, result)])
+
+    def put_many(self, items):
+        """Store (key, result) pairs in one transaction."""
+        if not items:
+            return
+        now = time.time()
+        rows = [(self._hash(key), self.fingerprint, json.dumps(result, separators=(",", ":")), now, now)
+                for key, result in items]
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    if self._touches:
+                        connection.executemany("UPDATE results SET used_at = ? WHERE key = ?",
+                                               [(used_at, digest) for digest, used_at in self._touches.items()])
+                        self._touches = {}
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO results (key, fingerprint, result, stored_at, used_at) "
+                        "VALUES (?, ?, ?, ?, ?)", rows
+                    )
+                    connection.execute("COMMIT")
+                except sqlite3.Error:
+                    connection.execute("ROLLBACK")
+                    raise
+                previous, self._writes = self._writes, self._writes + len(rows)
+                if previous // _EVICT_EVERY != self._writes // _EVICT_EVERY:
+                    self._evict(connection)
+        except sqlite3.Error as e:
+            self._log_error("write", e)
+
+    def _evict(self, connection):
+        """Drop the least recently used entries beyond capacity."""
+        count = connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        excess = count - self.capacity
+        if excess > 0:
+            connection.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used_at LIMIT ?)", (excess,)
+            )
+            DISK_CACHE_EVICTIONS.inc(excess)
+
+    def clear(self):
+        try:
+            with self._lock:
+                self._connect().execute("DELETE FROM results")
+        except sqlite3.Error as e:
+            self._log_error("clear", e)
+
+    def _log_error(self, action, error):
+        # A broken cache must never fail an extraction
+        DISK_CACHE_ERRORS.inc(action=action)
+        logger.warning(f"Disk cache {action} failed ({self.path}): {error}")
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of extraction results with an optional time-to-live.
+    Results are copied on the way in and out. With a DiskCache as store,
+    memory misses fall through to disk and new results are written to both.
+    """
+
+    def __init__(self, capacity=CACHE_SIZE, ttl=CACHE_TTL, store=None):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.store = store
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.capacity > 0
+
+    def get(self, key):
+        """Return a copy of the cached result for key, or None."""
+        return self.get_many([key])[0]
+
+    def get_many(self, keys):
+        """Copies of the cached results for keys, in order, with None for misses."""
+        results = [self._get_memory(key) for key in keys] if self.enabled else [None] * len(keys)
+        if self.store is not None:
+            missing = [i for i, result in enumerate(results) if result is None]
+            if missing:
+                for i, result in zip(missing, self.store.get_many([keys[i] for i in missing])):
+                    if result is not None:
+                        self._put_memory(keys[i], result)
+                        results[i] = result
+        return results
+
+    def _get_memory(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, result = entry
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                CACHE_EXPIRATIONS.inc()
+                return None
+            self._entries.move_to_end(key)
+        return copy_result(result)
+
+    def put(self, key, result):
+        self.put_many([(key, result)])
+
+    def put_many(self, items):
+        """Cache (key, result) pairs, writing them to the disk store in one go."""
+        if self.store is not None:
+            self.store.put_many(items)
+        for key, result in items:
+            self._put_memory(key, result)
+
+    def _put_memory(self, key, result):
+        if not self.enabled:
+            return
+        result = copy_result(result)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                CACHE_EVICTIONS.inc()
+
+    def clear(self):
+        """Empty the in-memory entries (the disk store is shared and left alone)."""
+        with self._lock:
+            self._entries.clear()
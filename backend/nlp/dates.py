@@ -0,0 +1,99 @@
+import calendar
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from dateparser import parse as date_parse
+from utils.metrics import registry
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Maximum number of dateparser results kept in the fallback memo cache
+FALLBACK_CACHE_SIZE = 1024
+
+_fallback_cache = OrderedDict()
+_fallback_lock = threading.Lock()
+
+DATE_RESOLUTIONS = registry.counter("nlp_date_resolutions_total",
+                                    "Date phrases resolved natively, from the memo cache, or by dateparser",
+                                    labels=("resolver",))
+
+
+def _add_month(reference):
+    """Same day next month, clamped to the length of that month."""
+    year = reference.year + reference.month // 12
+    month = reference.month % 12 + 1
+    day = min(reference.day, calendar.monthrange(year, month)[1])
+    return reference.replace(year=year, month=month, day=day)
+
+
+def _resolve_weekday(words, reference):
+    """
+    "friday" and "this friday" are the next friday on or after the reference
+    day; "next friday" is the first friday strictly after it.
+    """
+    days_ahead = (WEEKDAYS.index(words[-1]) - reference.weekday()) % 7
+    if words[0] == "next" and days_ahead == 0:
+        days_ahead = 7
+    return reference + timedelta(days=days_ahead)
+
+
+def _resolve_native(phrase, reference):
+    """Resolve the closed set of phrases the time scanner recognises, or return None."""
+    if phrase == "today":
+        return reference
+    if phrase == "tomorrow":
+        return reference + timedelta(days=1)
+    if phrase == "next week":
+        return reference + timedelta(days=7)
+    if phrase == "next month":
+        return _add_month(reference)
+    if phrase == "noon":
+        return reference.replace(hour=12, minute=0, second=0, microsecond=0)
+    if phrase == "midnight":
+        return reference.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    words = phrase.split()
+    if words and words[-1] in WEEKDAYS and (len(words) == 1 or (len(words) == 2 and words[0] in ("this", "next"))):
+        return _resolve_weekday(words, reference)
+    return None
+
+
+def _resolve_fallback(phrase, reference):
+    """
+    Send a phrase to dateparser, memoised by (phrase, reference). dateparser
+    resolves against the full reference time, so "in 2 hours" must not be
+    shared between two times of the same day; a batch resolves every text
+    against one reference, so repeats within it still hit.
+    """
+    key = (phrase, reference)
+    with _fallback_lock:
+        if key in _fallback_cache:
+            _fallback_cache.move_to_end(key)
+            DATE_RESOLUTIONS.inc(resolver="memo")
+            return _fallback_cache[key]
+    DATE_RESOLUTIONS.inc(resolver="dateparser")
+
+    dt = date_parse(phrase, settings={"RELATIVE_BASE": reference})
+
+    with _fallback_lock:
+        _fallback_cache[key] = dt
+        if len(_fallback_cache) > FALLBACK_CACHE_SIZE:
+            _fallback_cache.popitem(last=False)
+    return dt
+
+
+def resolve_date(phrase, reference=None):
+    """
+    Resolve a date or time phrase to a datetime relative to reference.
+    Known relative forms are computed directly; anything else goes to
+    dateparser. Returns None when the phrase cannot be resolved.
+    """
+    reference = reference or datetime.now()
+    phrase = " ".join(phrase.lower().split())
+    resolved = _resolve_native(phrase, reference)
+    if resolved is None:
+        resolved = _resolve_fallback(phrase, reference)
+    else:
+        DATE_RESOLUTIONS.inc(resolver="native")
+    return resolved
+
@@ -0,0 +1,102 @@
+from spacy.attrs import IS_STOP, LOWER, POS, SHAPE
+from spacy.symbols import DET, PROPN, PUNCT, VERB
+from nlp.rules import compiled_rules
+
+# Attributes read from the Doc in one to_array call
+_ATTRS = [POS, IS_STOP, SHAPE, LOWER]
+
+
+class DocFeatures:
+    """
+    Token features of one parsed Doc, computed once and shared by the rule
+    stages. Instead of every stage walking the Doc and re-checking POS tags,
+    stop words and capitalisation token by token, they read these arrays
+    and the spans derived from them:
+
+    - text / ents: doc.text and doc.ents, which spaCy rebuilds on every access
+    - matches: spans matched by each rule of nlp.rules, from one matcher pass
+    - next_content[i]: first token after i that is not a stop word,
+      punctuation or determiner (len(doc) if there is none)
+    - upper_end[i] / name_end[i]: end (exclusive) of the run of capitalised
+      tokens, or of capitalised/PROPN tokens that are not indicators,
+      continuing a run that starts at i
+    - with_spans: (start, end) of the capitalised run that follows each
+      "with", skipping stop words, punctuation and determiners
+    - indicator_targets: (last indicator token, next content index) for
+      every participant indicator
+    - collective: indices of collective nouns such as "team"
+    - non_person: (start, end) of words that are never a person's name
+    - location_prepositions: indices of prepositions that introduce a location
+    - chunk_starts: noun chunks by their start token, built on first use
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.text = doc.text
+        self.ents = doc.ents
+        n = len(doc)
+        strings = doc.vocab.strings
+        columns = doc.to_array(_ATTRS).T.tolist() if n else [[], [], [], []]
+        self.pos, is_stop, shapes, lowers = columns
+
+        # A token starts with an uppercase letter exactly when its shape starts with "X"
+        shape_upper = {shape: strings[shape][:1] == "X" for shape in set(shapes)}
+        self.upper = [shape_upper[shape] for shape in shapes]
+        lower_text = {lower: strings[lower] for lower in set(lowers)}
+        self.lower = [lower_text[lower] for lower in lowers]
+
+        skippable = [stop or pos in (PUNCT, DET) for stop, pos in zip(is_stop, self.pos)]
+        self.matches = compiled_rules(doc.vocab)(doc)
+        indicator = [False] * n
+        for start, end in self.matches["participant_indicator"]:
+            indicator[start:end] = [True] * (end - start)
+        upper = self.upper
+        nameish = [up or pos == PROPN for up, pos in zip(upper, self.pos)]
+
+        # One backward pass fills every look-ahead table; the carried values
+        # are what the entries of the token after i hold
+        next_content = [n] * n
+        upper_end = [n] * n
+        name_end = [n] * n
+        following = upper_run = name_run = n
+        for i in range(n - 1, -1, -1):
+            next_content[i] = following
+            upper_end[i] = upper_run
+            name_end[i] = name_run
+            if not skippable[i]:
+                following = i
+            if not upper[i]:
+                upper_run = i
+            if not nameish[i] or indicator[i]:
+                name_run = i
+        self.next_content = next_content
+        self.upper_end = upper_end
+        self.name_end = name_end
+
+        self.with_spans = []
+        self.indicator_targets = []
+        for start, end in self.matches["participant_indicator"]:
+            i = end - 1
+            j = next_content[i]
+            self.indicator_targets.append((i, j))
+            if self.lower[i] == "with" and j < n and upper[j]:
+                self.with_spans.append((j, upper_end[j]))
+
+        self.collective = {start for start, _ in self.matches["collective_noun"]}
+        self.non_person = set(self.matches["non_person"])
+        self.location_prepositions = [start for start, _ in self.matches["location_preposition"]]
+
+        self._chunk_starts = None
+
+    @property
+    def chunk_starts(self):
+        if self._chunk_starts is None:
+            self._chunk_starts = {chunk.start: chunk for chunk in self.doc.noun_chunks}
+        return self._chunk_starts
+
+    def with_texts(self):
+        """Texts of the capitalised runs that follow "with"."""
+        return [self.doc[start:end].text for start, end in self.with_spans]
+
+    def has_verb(self, start, end):
+        return VERB in self.pos[start:end]
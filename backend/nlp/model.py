@@ -0,0 +1,116 @@
+import logging
+import os
+import threading
+import time
+import spacy
+from utils.metrics import registry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = os.getenv("NLP_MODEL", "en_core_web_sm")
+
+# Strings the vocab may gain after loading before a fresh model is swapped in (0 never rotates).
+# Every unseen word adds a string and a lexeme, roughly 0.7 KB together.
+MAX_VOCAB_GROWTH = int(os.getenv("NLP_MAX_VOCAB_GROWTH", "100000"))
+
+MODEL_ROTATIONS = registry.counter("nlp_model_rotations_total",
+                                   "Times the spaCy model was replaced by a fresh copy to release vocab growth")
+MODEL_LOAD_SECONDS = registry.histogram("nlp_model_load_seconds", "Time to load a replacement spaCy model")
+
+
+def vocab_size(pipeline):
+    """(strings, lexemes) held by a pipeline's vocab."""
+    vocab = pipeline.vocab
+    return len(vocab.strings), len(vocab)
+
+
+class ModelManager:
+    """
+    Owns the spaCy model and keeps its vocab from growing without bound.
+    Every new word a parse sees stays in the vocab's StringStore and lexeme
+    table for the life of the model, so a long-running worker slowly grows.
+    Once the strings added since loading pass max_growth, a fresh copy of
+    the model is loaded in a background thread and handed out by check()
+    when it is ready. Parses already running keep the old model (their Docs
+    hold a reference to it), and it is freed when the last one finishes.
+    """
+
+    def __init__(self, name=MODEL_NAME, max_growth=MAX_VOCAB_GROWTH):
+        self.name = name
+        self.max_growth = max_growth
+        self.pipeline = self._load()
+        self.loaded_at = time.time()
+        self.rotations = 0
+        self._baseline = vocab_size(self.pipeline)
+        self._lock = threading.Lock()
+        self._loader = None
+        self._replacement = None
+
+    def growth(self):
+        """Strings added to the vocab since the model was loaded."""
+        return vocab_size(self.pipeline)[0] - self._baseline[0]
+
+    def check(self):
+        """
+        Start loading a fresh model once the vocab has outgrown the limit.
+        Returns the fresh model to the one caller that swaps it in, once it
+        has finished loading, and None otherwise.
+        """
+        if self._replacement is not None:
+            return self._swap()
+        if self.max_growth > 0 and self._loader is None and self.growth() > self.max_growth:
+            with self._lock:
+                if self._loader is None and self._replacement is None:
+                    logger.info(f"Vocab grew by {self.growth()} strings, loading a fresh {self.name} model")
+                    self._loader = threading.Thread(target=self._load_replacement, name="model-loader", daemon=True)
+                    self._loader.start()
+        return None
+
+    def stats(self):
+        strings, lexemes = vocab_size(self.pipeline)
+        return {
+            "pid": os.getpid(),
+            "model": self.name,
+            "strings": strings,
+            "lexemes": lexemes,
+            "growth": strings - self._baseline[0],
+            "max_growth": self.max_growth,
+            "rotations": self.rotations,
+            "loading": self._loader is not None,
+            "age": time.time() - self.loaded_at
+        }
+
+    def _load(self):
+        return spacy.load(self.name)
+
+    def _load_replacement(self):
+        try:
+            start = time.perf_counter()
+            pipeline = self._load()
+            # The first parse initializes lazily built tables, so do it off the request path
+            pipeline("warm up the pipeline")
+            MODEL_LOAD_SECONDS.observe(time.perf_counter() - start)
+            self._replacement = pipeline
+        except Exception as e:
+            logger.error(f"Error loading a fresh {self.name} model: {e}")
+            # Try again once the vocab has grown by another max_growth strings
+            self._baseline = (self._baseline[0] + self.max_growth, self._baseline[1])
+            self._loader = None
+
+    def _swap(self):
+        with self._lock:
+            replacement = self._replacement
+            if replacement is None:
+                # Another caller swapped it in first
+                return None
+            old_strings = vocab_size(self.pipeline)[0]
+            self.pipeline = replacement
+            self.loaded_at = time.time()
+            self.rotations += 1
+            self._baseline = vocab_size(replacement)
+            self._replacement = None
+            self._loader = None
+        MODEL_ROTATIONS.inc()
+        logger.info(f"Swapped in a fresh {self.name} model ({old_strings} -> {self._baseline[0]} strings)")
+        return replacement
@@ -1,17 +1,138 @@
+import hashlib
 import json
+import multiprocessing
 import spacy
 import re
 import os
+import sys
+import time
 import logging
-from dateparser import parse as date_parse
-from datetime import datetime, timedelta
+from datetime import datetime
+from spacy.lang.en.stop_words import STOP_WORDS
+from spacy.symbols import ADJ, PROPN, VERB
+
+if __name__ == "__main__" and not __package__:
+    # Run as `python nlp/nlp.py`: import the nlp package from backend/, not this file
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from nlp.timescan import scan_time_spans, spans_by_priority, clock_texts
+from nlp.dates import resolve_date
+from nlp.features import DocFeatures
+from nlp.model import ModelManager
+from nlp.segment import segment_spans, span_docs
+from nlp.cache import ResultCache, DiskCache, DISK_CACHE_PATH, cache_key, copy_result, dedup_ratio
+from nlp.rules import RULES
+from nlp.taskio import detect_format, imap_ordered, iter_shards, iter_tasks, last_completed_index, output_record
+from utils.metrics import registry, SIZE_BUCKETS
+from utils.serialization import dumps
+
+# Patterns used by the rule stages, compiled once at import
+_WITH_NAME = re.compile(r'\bwith\s+([A-Z][a-z]+)\b')
+_NUMBER_WITH_PERIOD = re.compile(r'\d+\s*(?:am|pm|AM|PM)')
+_CLOCK_TIME = re.compile(r'\b\d{1,2}(?::\d{2})?\s*(?:am|pm|a\.m\.|p\.m\.)\b', re.IGNORECASE)
+_BARE_NUMBER = re.compile(r'^\d+(?::\d+)?$')
+
+# Entity labels that name places rather than people
+_LOCATION_LABELS = {"FAC", "GPE", "LOC", "ORG"}
+
+# Extraction metrics, exposed by the /metrics endpoint
+STAGE_SECONDS = registry.histogram("nlp_stage_seconds", "Time spent in each extraction stage", labels=("stage",))
+INPUT_CHARS = registry.histogram("nlp_input_chars", "Length of input texts in characters", buckets=SIZE_BUCKETS)
+DOC_TOKENS = registry.histogram("nlp_doc_tokens", "Tokens per parsed text", buckets=SIZE_BUCKETS)
+DOC_ENTITIES = registry.histogram("nlp_doc_entities", "Named entities per parsed text", buckets=SIZE_BUCKETS)
+EXTRACTIONS = registry.counter("nlp_extractions_total", "Extractions by the path that produced them", labels=("path",))
+CACHE_LOOKUPS = registry.counter("nlp_cache_lookups_total", "Result cache lookups", labels=("result",))
+BATCH_DUPLICATES = registry.counter("nlp_batch_duplicates_total",
+                                    "Texts answered from an identical text earlier in the same batch")
+FAST_PATH_FALLBACKS = registry.counter("nlp_fast_path_fallbacks_total",
+                                       "Fast-mode texts that needed the full spaCy pipeline")
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load spaCy model once when module is imported
-nlp = spacy.load("en_core_web_sm")
+# Load spaCy model once when module is imported; the manager swaps in a
+# fresh copy when the vocab has grown too large
+model_manager = ModelManager()
+nlp = model_manager.pipeline
+
+# Version of the extraction logic. Bump it with any change to the rule stages
+# that changes their results, so persistent cache entries from before the
+# change are no longer returned
+RULES_VERSION = 1
+
+
+def model_fingerprint(pipeline=None):
+    """
+    Identify the spaCy version, model, rule set and extraction logic
+    results are produced with. Persistent cache entries are keyed by it,
+    so upgrading any of them invalidates the stored results.
+    """
+    pipeline = pipeline or nlp
+    digest = hashlib.sha256()
+    digest.update(f"{spacy.__version__} {pipeline.meta.get('name')} {pipeline.meta.get('version')}".encode())
+    digest.update(json.dumps(RULES, sort_keys=True).encode())
+    digest.update(f"rules version {RULES_VERSION}".encode())
+    return digest.hexdigest()[:16]
+
+
+def check_model():
+    """Switch to the fresh model once the model manager has one ready."""
+    global nlp
+    pipeline = model_manager.check()
+    if pipeline is not None:
+        nlp = pipeline
+
+
+def model_stats():
+    """Vocab size and rotations of the model in this process."""
+    return model_manager.stats()
+
+
+def default_cache():
+    """The in-memory result cache, backed by the persistent cache when NLP_DISK_CACHE is set."""
+    store = DiskCache(DISK_CACHE_PATH, model_fingerprint()) if DISK_CACHE_PATH else None
+    return ResultCache(store=store)
+
+
+# Number of texts nlp.pipe parses together in batch extraction
+DEFAULT_BATCH_SIZE = 64
+
+# "full" always runs the spaCy pipeline, "fast" tries the rules-only path first,
+# "segment" splits the text into several tasks and returns a list of results
+EXTRACTION_MODES = ("full", "fast", "segment")
+DEFAULT_EXTRACTION_MODE = os.getenv("NLP_EXTRACTION_MODE", "full")
+
+# Inputs longer than this are never handled by the rules-only path
+FAST_PATH_MAX_WORDS = 10
+# The full pipeline's task is a verb and its object, or a short noun phrase,
+# so longer task descriptions could come out differently
+FAST_PATH_MAX_TASK_WORDS = 2
+
+# Date and time expressions (with the preposition leading into them) that the
+# rules-only path strips from the text before building the task description.
+# "week" and "month" only count after "next", as in the time scanner
+_FAST_PATH_DATE_TIME = re.compile(
+    r'(?:\b(?:at|on|by|from|to|between|and|until|this|next)\s+)*'
+    r'(?:\b\d{1,2}(?::\d{2})?\s*(?:am|pm|a\.m\.|p\.m\.)(?!\w)'
+    r'|\b\d{1,2}\s*(?::\s*\d{2})?\s*(?:hrs|hours|hour)\b'
+    r'|\b(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b'
+    r'|\b(?:today|tomorrow|tonight|noon|midnight)\b'
+    r'|\bnext\s+(?:week|month)\b'
+    r'|\b(?:morning|afternoon|evening|night)\b)',
+    re.IGNORECASE
+)
+
+# Rule phrases that mean the text names people or places, which needs the parser and NER
+_FAST_PATH_BLOCKERS = {tuple(phrase.split())
+                       for label in ("participant_indicator", "location_preposition")
+                       for phrase in RULES[label]}
+
+# Repeating schedules the rules cannot express, such as "every week"
+_FAST_PATH_RECURRENCE = {"every", "each", "daily", "weekly", "monthly"}
+
+_FAST_PATH_CONNECTING_WORDS = {"on", "to", "for", "from", "about", "as", "into", "like", "of",
+                               "off", "onto", "out", "over", "past", "so", "than", "that", "up", "via"}
 
 class TaskExtractor:
     """
@@ -19,253 +140,340 @@ class TaskExtractor:
     Designed to work with the FastAPI application in main.py.
     """
     
-    def __init__(self):
+    def __init__(self, mode=DEFAULT_EXTRACTION_MODE, cache=None):
         # Removed specific task patterns and keywords to generalize task processing
-        pass
+        self.mode = mode
+        # Results of recent extractions, keyed by normalized text and reference day
+        self.cache = cache if cache is not None else default_cache()
     
-    def extract_from_text(self, text):
+    def extract_from_text(self, text, mode=None, reference=None):
         """
         Extract structured task information from natural language text.
-        Returns a dict with task, participants, date, time, locations.
+        Returns a dict with task, participants, date, time, locations and the
+        extraction_path ("rules" or "spacy") that produced it, or a list of
+        them in "segment" mode. Relative dates are resolved against
+        reference (default: now).
         """
-        extracted = {
-            "task": None,
-            "participants": [],
-            "date": None,
-            "time": None,
-            "end_time": None,
-            "locations": []
-        }
+        reference = reference or datetime.now()
+        mode = self._resolve_mode(mode)
+        INPUT_CHARS.observe(len(text))
+        key = cache_key(text, reference, mode)
+        extracted = self.cache.get(key)
+        if extracted is not None:
+            CACHE_LOOKUPS.inc(result="hit")
+            return extracted
+        CACHE_LOOKUPS.inc(result="miss")
+        
+        if mode == "fast":
+            extracted = self._extract_fast(text, reference)
+        
+        if extracted is None:
+            # Process the text with spaCy
+            check_model()
+            doc = self._timed("parse", nlp, text)
+            extracted = self._extract_parsed(doc, text, reference, mode)
+        
+        self.cache.put(key, extracted)
+        return extracted
+    
+    def extract_many(self, texts, batch_size=DEFAULT_BATCH_SIZE, mode=None, reference=None):
+        """
+        Extract structured task information from many texts at once.
+        Texts are parsed in batches with nlp.pipe and the rule stages are then
+        run over each Doc. Returns a list of dicts in the same order as texts.
+        The whole batch is resolved against one reference time, and texts
+        that normalise to the same cache key are only extracted once.
+        """
+        texts = list(texts)
+        reference = reference or datetime.now()
+        mode = self._resolve_mode(mode)
+        keys = [cache_key(text, reference, mode) for text in texts]
+        results = self.cache.get_many(keys)
+        misses = [i for i, result in enumerate(results) if result is None]
+        for text in texts:
+            INPUT_CHARS.observe(len(text))
+        CACHE_LOOKUPS.inc(len(texts) - len(misses), result="hit")
+        CACHE_LOOKUPS.inc(len(misses), result="miss")
+        
+        # Repeated texts share the result of their first occurrence
+        first_seen = {}
+        unique = []
+        duplicates = []
+        for i in misses:
+            first = first_seen.setdefault(keys[i], i)
+            if first == i:
+                unique.append(i)
+            else:
+                duplicates.append((i, first))
+        BATCH_DUPLICATES.inc(len(duplicates))
+        
+        if mode == "fast":
+            for i in unique:
+                results[i] = self._extract_fast(texts[i], reference)
+        
+        # Only the texts the cache and the rules-only path could not handle are parsed
+        pending = [i for i in unique if results[i] is None]
+        if pending:
+            check_model()
+        docs = iter(nlp.pipe((texts[i] for i in pending), batch_size=batch_size))
+        for i in pending:
+            # nlp.pipe parses a whole batch on the first next() of that batch
+            doc = self._timed("parse", next, docs)
+            results[i] = self._extract_parsed(doc, texts[i], reference, mode)
+        
+        self.cache.put_many([(keys[i], results[i]) for i in unique])
+        for i, first in duplicates:
+            results[i] = copy_result(results[first])
+        return results
+    
+    def extract_from_doc(self, doc, text, reference=None):
+        """Run the rule stages over an already parsed Doc."""
+        reference = reference or datetime.now()
+        extracted = self._new_result("spacy")
+        EXTRACTIONS.inc(path="spacy")
         
-        # Process the text with spaCy
-        doc = nlp(text)
+        # Token features and "with"/indicator spans shared by the stages below
+        features = self._timed("features", DocFeatures, doc)
+        DOC_TOKENS.observe(len(doc))
+        DOC_ENTITIES.observe(len(features.ents))
         
         # Step 1: Extract participants first - crucial to do this before locations
-        self._extract_participants(doc, extracted)
+        self._timed("participants", self._extract_participants, doc, extracted, features)
         
-        # Step 2: Extract dates and times
-        self._extract_date_time(doc.text, extracted)
+        # Step 2: Extract dates and times from one scan of the text
+        spans = self._timed("time_scan", scan_time_spans, features.text)
+        self._timed("date_time", self._extract_date_time, features.text, extracted, spans, reference)
         
         # Step 3: Extract locations (avoiding words already classified)
-        self._extract_locations(doc, extracted)
+        self._timed("locations", self._extract_locations, doc, extracted, spans, features)
         
         # Final pass: Check for capitalized names after "with" - these are almost always people, not locations
-        self._check_with_preposition(doc, extracted)
+        self._timed("with_preposition", self._check_with_preposition, doc, extracted, features)
         
         # Extract task information in a general manner
-        self._extract_task(doc, text, extracted)
+        self._timed("task", self._extract_task, doc, text, extracted)
         
         # Simplify the task description (cleanup and capitalize)
-        self._simplify_task(doc, text, extracted)
+        self._timed("simplify_task", self._simplify_task, doc, text, extracted)
 
         # Clean task from extracted entities and connecting words
-        self._clean_task_from_entities(doc, extracted)
+        self._timed("clean_task", self._clean_task_from_entities, doc, extracted, features)
         
         return extracted
     
-    def _extract_participants(self, doc, extracted):
+    def extract_segments(self, doc, reference=None):
+        """
+        Split a parsed paragraph such as "dentist Thursday at 3pm. Call Ann on
+        Sunday at noon" into its tasks and run the rule stages on each one.
+        Each task is a copy of its span of doc, so the text is only parsed
+        once. Returns one result per task, each with the task's "text" and
+        its "start" and "end" character offsets in the paragraph.
+        """
+        spans = self._timed("segment", segment_spans, doc)
+        results = []
+        for span, span_doc in zip(spans, self._timed("span_docs", span_docs, doc, spans)):
+            extracted = self.extract_from_doc(span_doc, span.text, reference)
+            extracted.update(text=span.text, start=span.start_char, end=span.end_char)
+            results.append(extracted)
+        return results
+    
+    def retime(self, result, text, reference=None):
+        """
+        A copy of result with its date and time found again in text, for an
+        edit that only changed the dates and times at the end of the text
+        result was extracted from. Only the time scan and date resolution run.
+        """
+        reference = reference or datetime.now()
+        extracted = copy_result(result)
+        extracted.update(date=None, time=None, end_time=None)
+        spans = self._timed("time_scan", scan_time_spans, text)
+        self._timed("date_time", self._extract_date_time, text, extracted, spans, reference)
+        return extracted
+    
+    def _extract_parsed(self, doc, text, reference, mode):
+        if mode == "segment":
+            return self.extract_segments(doc, reference)
+        return self.extract_from_doc(doc, text, reference)
+    
+    def _timed(self, stage, func, *args):
+        """Call func(*args) and record its duration under stage."""
+        start = time.perf_counter()
+        result = func(*args)
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+        return result
+    
+    def _extract_fast(self, text, reference):
+        """Try the rules-only path, counting the texts that have to fall back."""
+        extracted = self._timed("rules_only", self._extract_rules_only, text, reference)
+        if extracted is None:
+            FAST_PATH_FALLBACKS.inc()
+        else:
+            EXTRACTIONS.inc(path="rules")
+        return extracted
+    
+    def _resolve_mode(self, mode):
+        mode = mode or self.mode
+        if mode not in EXTRACTION_MODES:
+            raise ValueError(f"Unknown extraction mode '{mode}', expected one of {EXTRACTION_MODES}")
+        return mode
+    
+    def _new_result(self, path):
+        return {
+            "task": None,
+            "participants": [],
+            "date": None,
+            "time": None,
+            "end_time": None,
+            "locations": [],
+            "extraction_path": path
+        }
+    
+    def _extract_rules_only(self, text, reference=None):
+        """
+        Handle short, unambiguous inputs such as "gym workout at 6am tomorrow"
+        with the regex and lexical rules alone, skipping the spaCy parse.
+        Returns None when confidence is low and the full pipeline is needed.
+        """
+        words = text.split()
+        if not words or len(words) > FAST_PATH_MAX_WORDS:
+            return None
+        
+        extracted = self._new_result("rules")
+        self._extract_date_time(text, extracted, reference=reference)
+        # Without a date or time there is little for the rules to anchor on
+        if not extracted["date"] and not extracted["time"]:
+            return None
+        
+        remainder = _FAST_PATH_DATE_TIME.sub(" ", text).split()
+        lowered = [word.lower() for word in remainder]
+        task_words = []
+        for i, word in enumerate(remainder):
+            lower = lowered[i]
+            # People and places need the tagger and NER
+            if any(tuple(lowered[i:i + len(phrase)]) == phrase for phrase in _FAST_PATH_BLOCKERS):
+                return None
+            if lower in _FAST_PATH_RECURRENCE:
+                return None
+            # The parser leaves articles and stop words out of the task; without it they are a guess
+            if lower in STOP_WORDS and lower not in _FAST_PATH_CONNECTING_WORDS:
+                return None
+            # Capitalized words past the first one are likely names
+            if i > 0 and word[0].isupper():
+                return None
+            if not word.isalpha():
+                return None
+            if lower not in _FAST_PATH_CONNECTING_WORDS:
+                task_words.append(word)
+        
+        if not task_words or len(task_words) > FAST_PATH_MAX_TASK_WORDS:
+            return None
+        
+        task_text = " ".join(task_words)
+        extracted["task"] = task_text[0].upper() + task_text[1:]
+        return extracted
+    
+    def _extract_participants(self, doc, extracted, features=None):
         """Extract people names and potential participants based on context."""
+        if features is None:
+            features = DocFeatures(doc)
+        
         # First pass: Extract names specifically identified by spaCy as persons
-        for ent in doc.ents:
+        for ent in features.ents:
             if ent.label_ == "PERSON" and ent.text not in extracted["participants"]:
                 extracted["participants"].append(ent.text)
         
         # Second pass: Direct pattern matching for 'with [CapitalWord]' which are almost always people
-        with_name_pattern = re.compile(r'\bwith\s+([A-Z][a-z]+)\b')
-        matches = with_name_pattern.finditer(doc.text)
+        matches = _WITH_NAME.finditer(features.text)
         for match in matches:
             name = match.group(1)
             if name not in extracted["participants"]:
                 extracted["participants"].append(name)
         
-        # Third pass: Look for names with strong participant indicators
-        strong_indicators = ["with", "and", "meet", "call", "email", "contact", "talk to", "invite"]
-        collective_nouns = ["team", "staff", "group", "committee", "family", "class", "crew"]
+        # Third pass: Look for names with strong participant indicators (see nlp.rules)
+        place_entities = {ent.text for ent in features.ents if ent.label_ in _LOCATION_LABELS}
         
-        for token in doc:
-            if token.text.lower() in strong_indicators:
-                # Look ahead for potential name tokens
-                i = token.i + 1
-                
-                # Skip stop words and punctuation
-                while i < len(doc) and (doc[i].is_stop or doc[i].pos_ in ["PUNCT", "DET"]):
-                    i += 1
-                
-                # Handle collective nouns
-                if i < len(doc) and doc[i].text.lower() in collective_nouns:
-                    if doc[i].text not in extracted["participants"]:
-                        extracted["participants"].append(doc[i].text)
-                    continue
+        # Each indicator comes with the first token after it that is not a stop word or punctuation
+        for _, i in features.indicator_targets:
+            if i >= len(doc):
+                continue
+            
+            # Handle collective nouns
+            if i in features.collective:
+                if doc[i].text not in extracted["participants"]:
+                    extracted["participants"].append(doc[i].text)
+                continue
+            
+            # If we find a capitalized word or proper noun, consider it a name
+            # that runs to the end of the capitalized tokens
+            if features.upper[i] or features.pos[i] == PROPN:
+                name_end = features.name_end[i]
+                potential_name = doc[i:name_end].text
                 
-                # If we find a capitalized word or proper noun, consider it a name
-                if i < len(doc) and (doc[i].text[0].isupper() or doc[i].pos_ == "PROPN"):
-                    name_start = i
-                    name_end = i
+                # Skip common non-person capitalized words
+                if ((i, name_end) not in features.non_person and 
+                    potential_name not in place_entities and
+                    not _NUMBER_WITH_PERIOD.search(potential_name) and
+                    potential_name not in extracted["participants"]):
                     
-                    # Find the end of the name (which may be multiple tokens)
-                    while (name_end + 1 < len(doc) and 
-                           (doc[name_end + 1].text[0].isupper() or doc[name_end + 1].pos_ == "PROPN") and 
-                           doc[name_end + 1].text.lower() not in strong_indicators):
-                        name_end += 1
-                    
-                    # Extract the full name
-                    potential_name = doc[name_start:name_end + 1].text
-                    
-                    # Skip common non-person capitalized words
-                    non_person_words = ["monday", "tuesday", "wednesday", "thursday", "friday", 
-                                      "saturday", "sunday", "january", "february", "march", 
-                                      "april", "may", "june", "july", "august", "september", 
-                                      "october", "november", "december"]
-                    
-                    if (potential_name.lower() not in non_person_words and 
-                        not any(ent.text == potential_name and ent.label_ in {"GPE", "LOC", "FAC", "ORG"} for ent in doc.ents) and
-                        not re.search(r'\d+\s*(?:am|pm|AM|PM)', potential_name) and
-                        potential_name not in extracted["participants"]):
-                        
-                        extracted["participants"].append(potential_name)
+                    extracted["participants"].append(potential_name)
     
-    def _extract_entities(self, doc, extracted):
+    def _extract_entities(self, doc, extracted, reference=None):
         """Extract named entities and other structured information."""
-        location_labels = {"FAC", "GPE", "LOC", "ORG"}
-        
         for ent in doc.ents:
             if ent.label_ == "DATE":
-                dt = date_parse(ent.text)
+                dt = resolve_date(ent.text, reference)
                 if dt:
                     extracted["date"] = dt.strftime("%Y-%m-%d")
 
             elif ent.label_ == "TIME":
-                dt = date_parse(ent.text)
+                dt = resolve_date(ent.text, reference)
                 if dt:
                     extracted["time"] = dt.strftime("%H:%M")
                     
-            elif ent.label_ in location_labels:
+            elif ent.label_ in _LOCATION_LABELS:
                 # Don't add locations here - we'll do it in _extract_locations
                 # after participants and times are extracted
                 pass
 
-    def _extract_date_time(self, text, extracted):
-        """Extract dates and times using regex patterns."""
-        # Simplified time pattern for direct matching
-        simple_time_pattern = r'\b(\d{1,2})(?::(\d{2}))?\s*(am|pm|a\.m\.|p\.m\.|AM|PM|A\.M\.|P\.M\.)\b'
+    def _extract_date_time(self, text, extracted, spans=None, reference=None):
+        """Extract dates and times from the spans found by the time scanner."""
+        if spans is None:
+            spans = scan_time_spans(text)
         
         # Extract date first
         if not extracted["date"]:
-            date_patterns = [
-                r'\b(?:next|this)\s+(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b',
-                r'\b(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b',
-                r'\btomorrow\b', r'\btoday\b', r'\bnext week\b', r'\bnext month\b'
-            ]
-            
-            for pattern in date_patterns:
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    dt = date_parse(match.group(0))
-                    if dt:
-                        extracted["date"] = dt.strftime("%Y-%m-%d")
-                        break
-        
-        # Check for time ranges first
-        time_range_patterns = [
-            r'from\s+(\d{1,2}(?::\d{2})?\s*(?:AM|PM|am|pm))\s+to\s+(\d{1,2}(?::\d{2})?\s*(?:AM|PM|am|pm))',
-            r'(\d{1,2}(?::\d{2})?\s*(?:AM|PM|am|pm))\s+to\s+(\d{1,2}(?::\d{2})?\s*(?:AM|PM|am|pm))',
-            r'between\s+(\d{1,2}(?::\d{2})?\s*(?:AM|PM|am|pm))\s+and\s+(\d{1,2}(?::\d{2})?\s*(?:AM|PM|am|pm))'
-        ]
-        
-        for pattern in time_range_patterns:
-            time_range_match = re.search(pattern, text, re.IGNORECASE)
-            if time_range_match:
-                start_time_text = time_range_match.group(1)
-                end_time_text = time_range_match.group(2)
-                
-                # Parse start time
-                start_match = re.search(simple_time_pattern, start_time_text, re.IGNORECASE)
-                if start_match:
-                    hour = int(start_match.group(1))
-                    minute = 0
-                    if start_match.group(2):
-                        minute = int(start_match.group(2))
-                    period = start_match.group(3).lower()
-                    
-                    # Adjust hour for PM
-                    if 'pm' in period and hour < 12:
-                        hour += 12
-                    elif 'am' in period and hour == 12:
-                        hour = 0
-                        
-                    extracted["time"] = f"{hour:02d}:{minute:02d}"
-                
-                # Parse end time
-                end_match = re.search(simple_time_pattern, end_time_text, re.IGNORECASE)
-                if end_match:
-                    hour = int(end_match.group(1))
-                    minute = 0
-                    if end_match.group(2):
-                        minute = int(end_match.group(2))
-                    period = end_match.group(3).lower()
-                    
-                    # Adjust hour for PM
-                    if 'pm' in period and hour < 12:
-                        hour += 12
-                    elif 'am' in period and hour == 12:
-                        hour = 0
-                        
-                    extracted["end_time"] = f"{hour:02d}:{minute:02d}"
-                
-                # If we found a time range, exit
-                if extracted["time"] and extracted["end_time"]:
+            for span in spans_by_priority(spans, "date"):
+                dt = resolve_date(span.text, reference)
+                if dt:
+                    extracted["date"] = dt.strftime("%Y-%m-%d")
                     break
         
+        # Time ranges take precedence over individual times
+        ranges = spans_by_priority(spans, "range")
+        if ranges:
+            extracted["time"] = ranges[0].value
+            extracted["end_time"] = ranges[0].end_value
+        
         # Look for individual time if no range found
         if not extracted["time"]:
-            time_patterns = [
-                r'\b\d{1,2}\s*(?::\s*\d{2})?\s*(?:am|pm)\b',
-                r'\b\d{1,2}\s*(?::\s*\d{2})?\s*(?:a\.m\.|p\.m\.)\b',
-                r'\b\d{1,2}\s*(?::\s*\d{2})?\s*(?:AM|PM)\b',
-                r'\b\d{1,2}\s*(?::\s*\d{2})?\s*(?:A\.M\.|P\.M\.)\b',
-                r'\b\d{1,2}\s*(?::\s*\d{2})?\s*(?:hrs|hour|hours)\b',
-                r'\bnoon\b', r'\bmidnight\b'
-            ]
-            
-            for pattern in time_patterns:
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    # Handle special cases
-                    if match.group(0).lower() == 'noon':
-                        extracted["time"] = "12:00"
-                    elif match.group(0).lower() == 'midnight':
-                        extracted["time"] = "00:00"
-                    # Try direct time parsing
-                    else:
-                        time_match = re.search(simple_time_pattern, match.group(0), re.IGNORECASE)
-                        if time_match:
-                            hour = int(time_match.group(1))
-                            minute = 0
-                            if time_match.group(2):
-                                minute = int(time_match.group(2))
-                            period = ""
-                            if time_match.group(3):
-                                period = time_match.group(3).lower()
-                            
-                            # Adjust hour for AM/PM
-                            if period and 'pm' in period and hour < 12:
-                                hour += 12
-                            elif period and 'am' in period and hour == 12:
-                                hour = 0
-                                
-                            extracted["time"] = f"{hour:02d}:{minute:02d}"
-                        # Fallback to dateparser
-                        else:
-                            dt = date_parse(match.group(0))
-                            if dt:
-                                extracted["time"] = dt.strftime("%H:%M")
-                    
-                    # Break after finding valid time
-                    if extracted["time"]:
-                        break
+            for span in spans_by_priority(spans, "time"):
+                if span.value:
+                    extracted["time"] = span.value
+                # Durations such as "2 hours" are left to dateparser
+                else:
+                    dt = resolve_date(span.text, reference)
+                    if dt:
+                        extracted["time"] = dt.strftime("%H:%M")
+                
+                # Break after finding valid time
+                if extracted["time"]:
+                    break
     
-    def _extract_locations(self, doc, extracted):
+    def _extract_locations(self, doc, extracted, spans=None, features=None):
         """Extract locations based on prepositions and context, avoiding known participants and times."""
+        if features is None:
+            features = DocFeatures(doc)
+        
         # Create a list of words that are already classified as participants or times
         classified_words = []
         excluded_patterns = []
@@ -276,87 +484,72 @@ class TaskExtractor:
         
         # Add time-related words and values
         if extracted["time"] or extracted["end_time"]:
-            # Extract raw time values from the text
-            time_values = re.findall(r'\b(\d{1,2}(?::\d{2})?\s*(?:am|pm|a\.m\.|p\.m\.|AM|PM|A\.M\.|P\.M\.))\b', doc.text, re.IGNORECASE)
-            for time_val in time_values:
+            # Raw time values come from the scanner spans
+            if spans is None:
+                spans = scan_time_spans(features.text)
+            for time_val in clock_texts(spans):
                 classified_words.append(time_val.lower().strip())
                 excluded_patterns.append(time_val.lower().strip())
             
             # Also exclude time range expressions
+            text_lower = features.text.lower()
             for phrase in ["from", "to", "between", "and"]:
-                if phrase in doc.text.lower():
+                if phrase in text_lower:
                     excluded_patterns.append(phrase.lower())
         
         # Common time indicators to exclude from locations
         time_words = ["am", "pm", "morning", "afternoon", "evening", "night", "noon", "midnight"]
         classified_words.extend(time_words)
         
-        # Only consider strong location indicators
-        location_prepositions = {"at", "in", "near", "around", "by"}
-        
-        # Track potential "with X" patterns to exclude from locations
-        with_patterns = []
-        for i, token in enumerate(doc):
-            if token.text.lower() == "with" and i < len(doc) - 1:
-                j = i + 1
-                while j < len(doc) and (doc[j].is_stop or doc[j].pos_ in ["PUNCT", "DET"]):
-                    j += 1
-                if j < len(doc) and doc[j].text[0].isupper():
-                    name_end = j
-                    while name_end + 1 < len(doc) and doc[name_end + 1].text[0].isupper():
-                        name_end += 1
-                    with_patterns.append(doc[j:name_end+1].text)
+        # "with X" patterns are excluded from locations
+        with_patterns = features.with_texts()
         
         # Add these to classified words so they won't be picked up as locations
         for pattern in with_patterns:
             classified_words.extend(pattern.lower().split())
         
-        # Look for locations with prepositions
-        for token in doc:
-            if token.text.lower() in location_prepositions and token.i < len(doc) - 1:
+        # Look for locations after strong location indicators (see nlp.rules)
+        for i in features.location_prepositions:
+            if i < len(doc) - 1:
                 # Skip verb constructions and time expressions
-                if doc[token.i+1].pos_ == "VERB" or doc[token.i+1].ent_type_ in {"TIME", "DATE"}:
+                if features.pos[i+1] == VERB or doc[i+1].ent_type_ in {"TIME", "DATE"}:
                     continue
 
-                candidate = None
+                # Candidates are kept as spans of doc so their tokens keep the
+                # POS tags from the original parse. The full noun phrase
+                # starting right after the preposition is preferred.
+                candidate_span = features.chunk_starts.get(i + 1)
 
-                # Try to get the full noun phrase
-                for chunk in doc.noun_chunks:
-                    if chunk.start == token.i + 1:
-                        if doc[chunk.start].pos_ == "VERB":
-                            continue
-                        candidate = chunk.text
-                        break
-
-                if not candidate:
-                    if token.i + 2 < len(doc) and (doc[token.i+1].pos_ in ["ADJ", "PROPN"] or doc[token.i+1].dep_ == "compound"):
-                        if doc[token.i+1].pos_ != "VERB":
-                            candidate = f"{doc[token.i+1].text} {doc[token.i+2].text}"
-                    else:
-                        if doc[token.i+1].pos_ != "VERB":
-                            candidate = doc[token.i+1].text
+                if candidate_span is not None:
+                    candidate = candidate_span.text
+                elif i + 2 < len(doc) and (features.pos[i+1] in (ADJ, PROPN) or doc[i+1].dep_ == "compound"):
+                    candidate_span = doc[i+1:i+3]
+                    # Two tokens are joined with a space even when they touch in the text ("Joe 's")
+                    candidate = f"{doc[i+1].text} {doc[i+2].text}"
+                else:
+                    candidate_span = doc[i+1:i+2]
+                    candidate = candidate_span.text
 
                 if candidate and candidate not in with_patterns and candidate not in extracted["locations"]:
                     candidate_lower = candidate.lower()
                     
                     # Skip if candidate has any disqualifying features
-                    if (re.search(r'\b\d{1,2}(?::\d{2})?\s*(?:am|pm|a\.m\.|p\.m\.|AM|PM)\b', candidate_lower, re.IGNORECASE) or
+                    if (_CLOCK_TIME.search(candidate_lower) or
                         any(word in candidate_lower.split() for word in classified_words) or
                         any(pattern in candidate_lower for pattern in excluded_patterns) or
-                        any(tok.pos_ == "VERB" for tok in nlp(candidate)) or
-                        re.search(r'^\d+(?::\d+)?$', candidate_lower)):
+                        features.has_verb(candidate_span.start, candidate_span.end) or
+                        _BARE_NUMBER.search(candidate_lower)):
                         continue
                     
                     # Add the location
                     extracted["locations"].append(candidate)
         
         # Add named locations identified by spaCy
-        location_labels = {"FAC", "GPE", "LOC", "ORG"}
-        for ent in doc.ents:
-            if (ent.label_ in location_labels and
+        for ent in features.ents:
+            if (ent.label_ in _LOCATION_LABELS and
                 ent.text not in extracted["participants"] and
                 ent.text not in with_patterns and
-                not re.search(r'\b\d{1,2}(?::\d{2})?\s*(?:am|pm)\b', ent.text.lower(), re.IGNORECASE) and
+                not _CLOCK_TIME.search(ent.text.lower()) and
                 ent.text not in extracted["locations"] and
                 not any(word in ent.text.lower().split() for word in classified_words)):
                 
@@ -400,10 +593,11 @@ class TaskExtractor:
             task_text = task_text[0].upper() + task_text[1:]
         extracted["task"] = task_text
         
-    def _clean_task_from_entities(self, doc, extracted):
+    def _clean_task_from_entities(self, doc, extracted, features=None):
         """Remove detected entities and connecting words from the task."""
         if not extracted["task"]:
             return
+        ents = features.ents if features is not None else doc.ents
             
         task_text = extracted["task"]
         words_to_remove = set()
@@ -416,7 +610,7 @@ class TaskExtractor:
             words_to_remove.update(location.lower().split())
             
         # Add date and time entities
-        for ent in doc.ents:
+        for ent in ents:
             if ent.label_ in ["DATE", "TIME"]:
                 words_to_remove.update(ent.text.lower().split())
         
@@ -452,52 +646,52 @@ class TaskExtractor:
         cleaned_task = cleaned_task.strip('"\'')
         extracted["task"] = cleaned_task
 
-    def _check_with_preposition(self, doc, extracted):
+    def _check_with_preposition(self, doc, extracted, features=None):
         """Final check for 'with X' patterns that should be participants, moving them from locations if needed."""
-        # Process "with X" patterns which strongly indicate people rather than places
-        for i, token in enumerate(doc):
-            if token.text.lower() == "with" and i < len(doc) - 1:
-                # Look ahead for capitalized words or proper nouns
-                j = i + 1
-                while j < len(doc) and (doc[j].is_stop or doc[j].pos_ in ["PUNCT", "DET"]):
-                    j += 1  # Skip stop words and punctuation
-                
-                if j < len(doc) and doc[j].text[0].isupper():
-                    # This is likely a name after "with" - check if it's in locations
-                    name_start = j
-                    name_end = j
-                    
-                    # Get the full name (which may be multiple tokens)
-                    while name_end + 1 < len(doc) and doc[name_end + 1].text[0].isupper():
-                        name_end += 1
-                    
-                    potential_name = doc[name_start:name_end + 1].text
-                    
-                    # If this potential name is currently marked as a location, move it to participants
-                    if potential_name in extracted["locations"]:
-                        extracted["locations"].remove(potential_name)
-                        if potential_name not in extracted["participants"]:
-                            extracted["participants"].append(potential_name)
+        if features is None:
+            features = DocFeatures(doc)
+        
+        # Names after "with" strongly indicate people rather than places
+        for potential_name in features.with_texts():
+            # If this potential name is currently marked as a location, move it to participants
+            if potential_name in extracted["locations"]:
+                extracted["locations"].remove(potential_name)
+                if potential_name not in extracted["participants"]:
+                    extracted["participants"].append(potential_name)
 
 
 extractor = TaskExtractor()
 
 
-def extract_entities(text):
+def extract_entities(text, mode=None, reference=None):
     """
     Extract entities from text using the TaskExtractor.
     This function maintains compatibility with existing code.
     """
-    return extractor.extract_from_text(text)
+    return extractor.extract_from_text(text, mode=mode, reference=reference)
 
 
-def process_input_file(input_file="input.json", output_file="output.json"):
+def retime_entities(result, text, reference=None):
+    """Re-resolve the date and time of an extraction result for an edited text (see TaskExtractor.retime)."""
+    return extractor.retime(result, text, reference=reference)
+
+
+def extract_entities_batch(texts, batch_size=DEFAULT_BATCH_SIZE, mode=None, reference=None):
+    """
+    Extract entities from a list of texts in one batched pass.
+    Results are returned in the same order as the input texts.
+    """
+    return extractor.extract_many(texts, batch_size=batch_size, mode=mode, reference=reference)
+
+
+def process_input_file(input_file="input.json", output_file="output.json", reference=None):
     """
     Process tasks from an input JSON file and write results to an output JSON file.
     
     Args:
         input_file (str): Path to the input JSON file.
         output_file (str): Path to write the output JSON file.
+        reference (datetime): Time relative dates are resolved against (default: now).
         
     Returns:
         bool: True if processing was successful, False otherwise.
@@ -510,20 +704,20 @@ def process_input_file(input_file="input.json", output_file="output.json"):
             data = json.load(infile)
 
         tasks = data.get("tasks", [])
+        texts = [entry.get("text", "") for entry in tasks]
+        texts = [text for text in texts if text]
         output_results = []
 
-        for entry in tasks:
-            text = entry.get("text", "")
-            if text:
-                parsed = extract_entities(text)
-                output_results.append({
-                    "original_text": text,
-                    "extracted_entities": parsed
-                })
+        for text, parsed in zip(texts, extract_entities_batch(texts, reference=reference)):
+            output_results.append({
+                "original_text": text,
+                "extracted_entities": parsed
+            })
 
         with open(output_path, "w") as outfile:
             json.dump({"results": output_results}, outfile, indent=4)
 
+        logger.info(f"{input_file}: {len(texts)} tasks, dedup ratio {dedup_ratio(texts):.2f}")
         print(f"Entity extraction complete. Check the {output_file} file.")
         return True
     except Exception as e:
@@ -532,14 +726,129 @@ def process_input_file(input_file="input.json", output_file="output.json"):
         return False
 
 
+# Shards handed to the pool ahead of the one being written, per worker
+SHARDS_IN_FLIGHT_PER_JOB = 4
+
+
+def _init_stream_worker():
+    """Warm up the model inherited from (or loaded by) the parent process."""
+    extract_entities("warm up the pipeline")
+
+
+def _extract_shard(shard, batch_size, mode, reference):
+    indices, texts = shard
+    return indices, texts, extract_entities_batch(texts, batch_size, mode=mode, reference=reference)
+
+
+def process_input_stream(input_file, output_file, resume=True, batch_size=DEFAULT_BATCH_SIZE,
+                         reference=None, input_format=None, progress_every=1000, progress=None,
+                         jobs=1, mode=None):
+    """
+    Process a large task file in constant memory and write results as JSONL.
+    
+    Tasks are read incrementally from JSONL (one {"text": ...} per line) or
+    from the {"tasks": [...]} JSON shape, extracted in batches, and each
+    result is written as soon as its batch is done. Every output line holds
+    the input index, so after a crash the run picks up after the last
+    complete line. With several jobs the batches are sharded across worker
+    processes, each with its own copy of the model, and still written in
+    input order.
+    
+    Args:
+        input_file (str): Path to the JSON or JSONL input file, or "-" for stdin.
+        output_file (str): Path of the JSONL output file, or "-" for stdout.
+        resume (bool): Continue after the last completed record instead of starting over.
+        batch_size (int): Number of texts extracted together, and sent to a worker at a time.
+        reference (datetime): Time relative dates are resolved against (default: now).
+        input_format (str): "json" or "jsonl"; detected from the file extension if omitted
+            (JSONL for stdin).
+        progress_every (int): Log progress after this many input entries.
+        progress (callable): Called as progress(entries_done, records_written, seconds)
+            after every batch written.
+        jobs (int): Worker processes; 1 extracts in this process.
+        mode (str): Extraction mode (default: the extractor's).
+        
+    Returns:
+        bool: True if processing was successful, False otherwise.
+    """
+    use_stdin = input_file == "-"
+    use_stdout = output_file == "-"
+    infile = outfile = None
+    try:
+        input_path = None if use_stdin else os.path.abspath(input_file)
+        output_path = None if use_stdout else os.path.abspath(output_file)
+        input_format = input_format or ("jsonl" if use_stdin else detect_format(input_path))
+        reference = reference or datetime.now()
+        
+        resume_after = last_completed_index(output_path) if resume and not use_stdout else -1
+        if resume_after >= 0:
+            logger.info(f"Resuming {input_file} after entry {resume_after}")
+        
+        start = time.perf_counter()
+        entries_done = resume_after + 1
+        written = 0
+        next_log = (entries_done // progress_every + 1) * progress_every if progress_every else None
+        
+        def read_tasks():
+            nonlocal entries_done
+            for index, text in iter_tasks(infile, input_format):
+                if index > resume_after:
+                    entries_done = index + 1
+                    yield index, text
+        
+        def write_shards(results):
+            nonlocal written, next_log
+            for indices, texts, parsed in results:
+                outfile.write(b"".join(
+                    dumps(output_record(index, text, entities)) + b"\n"
+                    for index, text, entities in zip(indices, texts, parsed)
+                ))
+                outfile.flush()
+                written += len(indices)
+                
+                elapsed = time.perf_counter() - start
+                if next_log is not None and entries_done >= next_log:
+                    logger.info(f"{input_file}: {entries_done} entries read, {written} results written "
+                                f"({written / elapsed if elapsed else 0:.1f}/s)")
+                    next_log = (entries_done // progress_every + 1) * progress_every
+                if progress:
+                    progress(entries_done, written, elapsed)
+        
+        infile = sys.stdin if use_stdin else open(input_path, "r")
+        outfile = sys.stdout.buffer if use_stdout else open(output_path, "ab" if resume else "wb")
+        shards = iter_shards(read_tasks(), batch_size)
+        args = (batch_size, mode, reference)
+        if jobs <= 1:
+            write_shards(_extract_shard(shard, *args) for shard in shards)
+        else:
+            with multiprocessing.Pool(jobs, initializer=_init_stream_worker) as pool:
+                write_shards(imap_ordered(pool, _extract_shard, shards, args, jobs * SHARDS_IN_FLIGHT_PER_JOB))
+        
+        elapsed = time.perf_counter() - start
+        if progress:
+            progress(entries_done, written, elapsed)
+        logger.info(f"Entity extraction complete: {written} results written to {output_file} in {elapsed:.1f}s")
+        return True
+    except Exception as e:
+        logger.error(f"Error processing {input_file}: {e}")
+        print(f"Error processing {input_file}: {e}", file=sys.stderr)
+        return False
+    finally:
+        if infile is not None and not use_stdin:
+            infile.close()
+        if outfile is not None and not use_stdout:
+            outfile.close()
+
+
 def main():
     """
     Process the default input.json file and generate output.json with extracted entities.
-    This maintains compatibility with existing code.
+    This maintains compatibility with existing code; task files are streamed
+    with `python -m nlp`.
     """
     return process_input_file()
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(0 if main() else 1)
 
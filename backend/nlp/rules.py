@@ -0,0 +1,52 @@
+from spacy.matcher import PhraseMatcher
+from spacy.tokens import Doc
+
+# Word rules of the participant and location heuristics, by label.
+# Phrases are matched case-insensitively on whole tokens, so multi-word
+# entries such as "talk to" match the token sequence.
+RULES = {
+    # Words after which a name or group of people usually follows
+    "participant_indicator": ["with", "and", "meet", "call", "email", "contact", "talk to", "invite"],
+    # Groups of people that count as a participant on their own
+    "collective_noun": ["team", "staff", "group", "committee", "family", "class", "crew"],
+    # Capitalized words that are never a person's name
+    "non_person": ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+                   "january", "february", "march", "april", "may", "june", "july", "august",
+                   "september", "october", "november", "december"],
+    # Prepositions that introduce a location
+    "location_preposition": ["at", "in", "near", "around", "by"],
+}
+
+
+class CompiledRules:
+    """
+    The rule table compiled into one PhraseMatcher over a vocab, so all the
+    rules are applied to a Doc in a single pass.
+    """
+
+    def __init__(self, vocab, rules=RULES):
+        self.vocab = vocab
+        self.matcher = PhraseMatcher(vocab, attr="LOWER")
+        self.labels = {}
+        for label, phrases in rules.items():
+            self.labels[vocab.strings.add(label)] = label
+            self.matcher.add(label, [Doc(vocab, words=phrase.split()) for phrase in phrases])
+
+    def __call__(self, doc):
+        """Match every rule against doc; returns {label: [(start, end), ...]} in token order."""
+        matches = {label: [] for label in self.labels.values()}
+        for match_id, start, end in sorted(self.matcher(doc), key=lambda match: (match[1], match[2])):
+            matches[self.labels[match_id]].append((start, end))
+        return matches
+
+
+_compiled = None
+
+
+def compiled_rules(vocab):
+    """The rule table compiled for vocab, compiling it only when the vocab changes."""
+    global _compiled
+    compiled = _compiled
+    if compiled is None or compiled.vocab is not vocab:
+        compiled = _compiled = CompiledRules(vocab)
+    return compiled
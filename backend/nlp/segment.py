@@ -0,0 +1,114 @@
+import numpy
+from spacy.attrs import DEP, ENT_IOB, ENT_TYPE, HEAD, LEMMA, POS, TAG
+from spacy.symbols import CCONJ, VERB
+from spacy.tokens import Doc
+
+# Token annotations the rule stages read, copied from the paragraph to each task
+SPAN_ATTRS = [POS, TAG, LEMMA, DEP, HEAD, ENT_IOB, ENT_TYPE]
+_HEAD = SPAN_ATTRS.index(HEAD)
+_DEP = SPAN_ATTRS.index(DEP)
+_ENT_IOB = SPAN_ATTRS.index(ENT_IOB)
+
+# Words that join two tasks when a verb follows them, as in "buy milk and call Ann"
+_JOINING_WORDS = {"and", "then", "also"}
+
+# Punctuation that always ends a task. Sentence-final marks are included because
+# the parser often misses the boundaries of terse, lowercase notes; abbreviations
+# such as "Dr." and "p.m." keep their period in the same token.
+_TASK_SEPARATORS = {".", "!", "?", ";", "|", "•"}
+
+# Leading and trailing tokens that belong to neither neighbouring task
+_EDGE_WORDS = {"and", "then", "also", "or"}
+
+
+def _is_edge(token):
+    return token.is_punct or token.is_space or token.lower_ in _EDGE_WORDS
+
+
+def _starts_clause(doc, i, end):
+    """Whether the joining word(s) at i are followed by a verb before end."""
+    while i < end and (doc[i].lower_ in _JOINING_WORDS or doc[i].is_punct):
+        i += 1
+    return i < end and doc[i].pos == VERB
+
+
+def segment_spans(doc):
+    """
+    Split a parsed paragraph into one span per task, without parsing again.
+    Tasks end at sentence boundaries, line breaks and separators such as
+    "." or ";", and at a coordinating conjunction (or "then") that introduces a
+    new verb after a clause that already has one: "buy milk and call Ann"
+    is two tasks, while "lunch with Tim and Sarah" stays one. Joining
+    words and punctuation at the edges of a span are trimmed, and spans
+    without any words are dropped.
+    """
+    bounds = []
+    for sent in doc.sents:
+        start = sent.start
+        has_verb = False
+        for token in sent:
+            i = token.i
+            if token.is_space and "\n" in token.text or token.text in _TASK_SEPARATORS:
+                bounds.append((start, i))
+                start, has_verb = i + 1, False
+            elif (has_verb and i > start and (token.pos == CCONJ or token.lower_ in _JOINING_WORDS)
+                    and _starts_clause(doc, i, sent.end)):
+                bounds.append((start, i))
+                start, has_verb = i, False
+            elif token.pos == VERB:
+                has_verb = True
+        bounds.append((start, sent.end))
+
+    spans = []
+    for start, end in bounds:
+        while start < end and _is_edge(doc[start]):
+            start += 1
+        while end > start and _is_edge(doc[end - 1]):
+            end -= 1
+        if any(token.is_alpha or token.like_num for token in doc[start:end]):
+            spans.append(doc[start:end])
+    return spans
+
+
+def span_docs(doc, spans):
+    """
+    A standalone Doc for each span, like Span.as_doc() but converting the
+    paragraph to an array only once and copying only the annotations the
+    rule stages read, so the cost does not grow with the paragraph length.
+    Dependencies that leave the span are rewired the way as_doc() does it.
+    """
+    array = doc.to_array(SPAN_ATTRS)
+    dep = doc.vocab.strings.add("dep")
+    docs = []
+    for span in spans:
+        part = array[span.start:span.end].copy()
+        # Heads are stored as offsets from the token
+        heads = part[:, _HEAD].astype(numpy.int64) + numpy.arange(len(part))
+        outside = numpy.flatnonzero((heads < 0) | (heads >= len(part)))
+        if len(outside):
+            _rewire_heads(span, heads, outside)
+            part[outside, _DEP] = dep
+            part[:, _HEAD] = (heads - numpy.arange(len(part))).astype(numpy.uint64)
+        # An entity cut off by the start of the span begins there
+        if len(part) and part[0, _ENT_IOB] == 1:
+            part[0, _ENT_IOB] = 3
+        words = [token.text for token in span]
+        spaces = [bool(token.whitespace_) for token in span]
+        docs.append(Doc(doc.vocab, words=words, spaces=spaces).from_array(SPAN_ATTRS, part))
+    return docs
+
+
+def _rewire_heads(span, heads, outside):
+    """
+    Point tokens whose head is outside the span at their highest ancestor
+    inside it, or else at one new root per tree they belong to.
+    """
+    roots = {}
+    for i in outside:
+        top = None
+        for ancestor in span[i].ancestors:
+            top = ancestor.i
+            if span.start <= top < span.end:
+                heads[i] = top - span.start
+        if not 0 <= heads[i] < len(heads):
+            heads[i] = roots.setdefault(top, i)
@@ -0,0 +1,151 @@
+import json
+import os
+import re
+from collections import deque
+
+# Bytes read from the input file at a time
+READ_CHUNK_SIZE = 1 << 16
+
+_TASKS_ARRAY_START = re.compile(r'"tasks"\s*:\s*\[')
+
+
+def detect_format(path):
+    """"jsonl" for .jsonl/.ndjson files, "json" for the {"tasks": [...]} shape."""
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "json"
+
+
+def _task_text(entry):
+    """Tasks are {"text": ...} objects; plain strings are accepted too."""
+    if isinstance(entry, str):
+        return entry
+    if isinstance(entry, dict):
+        return entry.get("text", "")
+    return ""
+
+
+def _iter_jsonl(infile):
+    for line in infile:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _iter_json_tasks(infile):
+    """
+    Yield the entries of the "tasks" array one at a time without loading the
+    whole document. Only the unparsed tail of the file is kept in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+
+    # Find the opening bracket of the tasks array
+    while True:
+        match = _TASKS_ARRAY_START.search(buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        if eof:
+            return
+        # Keep enough of the tail to match a key split across chunks
+        buffer = buffer[-64:]
+        chunk = infile.read(READ_CHUNK_SIZE)
+        eof = not chunk
+        buffer += chunk
+
+    pos = 0
+    while True:
+        # Skip whitespace and separators between entries
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+        try:
+            if pos >= len(buffer):
+                raise ValueError("need more input")
+            entry, end = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            if eof:
+                raise ValueError("unexpected end of input inside the tasks array")
+            # The next entry is split across chunks: drop what was consumed and read on
+            buffer = buffer[pos:]
+            pos = 0
+            chunk = infile.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield entry
+        pos = end
+
+
+def iter_tasks(infile, input_format="json"):
+    """Yield (index, text) for every task entry of an open input file."""
+    entries = _iter_jsonl(infile) if input_format == "jsonl" else _iter_json_tasks(infile)
+    for index, entry in enumerate(entries):
+        yield index, _task_text(entry)
+
+
+def iter_shards(tasks, shard_size):
+    """Group the non-empty (index, text) tasks into (indices, texts) shards."""
+    indices, texts = [], []
+    for index, text in tasks:
+        if not text:
+            continue
+        indices.append(index)
+        texts.append(text)
+        if len(texts) >= shard_size:
+            yield indices, texts
+            indices, texts = [], []
+    if texts:
+        yield indices, texts
+
+
+def imap_ordered(pool, func, shards, args, in_flight):
+    """
+    Like pool.imap, but only keeps in_flight shards submitted at a time, so
+    the input is read no faster than it is processed.
+    """
+    pending = deque()
+    for shard in shards:
+        pending.append(pool.apply_async(func, (shard,) + args))
+        if len(pending) >= in_flight:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def output_record(index, text, entities):
+    """One line of a JSONL result file; its input index is what a resumed run continues after."""
+    return {"index": index, "original_text": text, "extracted_entities": entities}
+
+
+def last_completed_index(output_path):
+    """
+    Index of the last complete record in a JSONL output file, or -1.
+    A partial line left by a crash is truncated so writing can resume.
+    """
+    if not os.path.exists(output_path):
+        return -1
+
+    with open(output_path, "rb+") as outfile:
+        outfile.seek(0, os.SEEK_END)
+        size = outfile.tell()
+        # Read backwards until two newlines (or the start of the file) are found
+        tail = b""
+        pos = size
+        while pos > 0 and tail.count(b"\n") < 2:
+            step = min(READ_CHUNK_SIZE, pos)
+            pos -= step
+            outfile.seek(pos)
+            tail = outfile.read(step) + tail
+
+        complete, _, partial = tail.rpartition(b"\n")
+        if partial:
+            outfile.truncate(size - len(partial))
+        if not complete and not tail.endswith(b"\n"):
+            return -1
+
+        last_line = complete.rsplit(b"\n", 1)[-1]
+        if not last_line.strip():
+            return -1
+        return json.loads(last_line)["index"]
@@ -0,0 +1,142 @@
+import re
+from collections import namedtuple
+
+# A date, time or time-range expression found in the text.
+# kind is "date", "range" or "time"; rank orders spans of the same kind the
+# way the old cascade of patterns did (lower wins); value/end_value hold the
+# "HH:MM" times for clock times and ranges, or None when the text still has
+# to be resolved (dates, durations).
+TimeSpan = namedtuple("TimeSpan", ["kind", "rank", "start", "end", "text", "value", "end_value", "clocks"])
+
+_WEEKDAYS = r'monday|tuesday|wednesday|thursday|friday|saturday|sunday'
+
+# Clock times allowed as the ends of a range
+_RANGE_CLOCK = r'\d{1,2}(?::\d{2})?\s*(?:am|pm)'
+
+# Every alternative is tried at each position of one left-to-right pass, so
+# the whole text is scanned once no matter how many kinds of span it holds
+_SCANNER = re.compile(
+    rf'''
+    \bfrom\s+(?P<from_start>{_RANGE_CLOCK})\s+to\s+(?P<from_end>{_RANGE_CLOCK})(?!\w)
+  | \b(?P<to_start>{_RANGE_CLOCK})\s+to\s+(?P<to_end>{_RANGE_CLOCK})(?!\w)
+  | \bbetween\s+(?P<between_start>{_RANGE_CLOCK})\s+and\s+(?P<between_end>{_RANGE_CLOCK})(?!\w)
+  | (?P<clock>\b(?P<hour>\d{{1,2}})\s*(?::\s*(?P<minute>\d{{2}}))?\s*(?P<period>am|pm|a\.m\.|p\.m\.)(?!\w))
+  | (?P<hours>\b\d{{1,2}}\s*(?::\s*\d{{2}})?\s*(?:hrs|hours|hour)\b)
+  | (?P<noon>\bnoon\b)
+  | (?P<midnight>\bmidnight\b)
+  | (?P<relative_weekday>\b(?:next|this)\s+(?P<relative_day>{_WEEKDAYS})\b)
+  | (?P<weekday>\b(?:{_WEEKDAYS})\b)
+  | (?P<tomorrow>\btomorrow\b)
+  | (?P<today>\btoday\b)
+  | (?P<next_week>\bnext\s+week\b)
+  | (?P<next_month>\bnext\s+month\b)
+    ''',
+    re.IGNORECASE | re.VERBOSE
+)
+
+# Used only to split the two ends of a range into hour, minute and period
+_CLOCK = re.compile(r'(\d{1,2})(?::(\d{2}))?\s*(am|pm)', re.IGNORECASE)
+
+# Ranks keep the precedence of the old pattern lists
+_RANGE_RANKS = {"from_start": 0, "to_start": 1, "between_start": 2}
+_TIME_RANKS = {"clock": 0, "hours": 1, "noon": 2, "midnight": 3}
+_DATE_RANKS = {"relative_weekday": 0, "weekday": 1, "tomorrow": 2, "today": 3, "next_week": 4, "next_month": 5}
+
+
+def _to_24h(hour, minute, period):
+    """Convert a 12-hour clock reading to an "HH:MM" string."""
+    hour = int(hour)
+    minute = int(minute) if minute else 0
+    period = period.lower() if period else ""
+    if period.startswith("p") and hour < 12:
+        hour += 12
+    elif period.startswith("a") and hour == 12:
+        hour = 0
+    return f"{hour:02d}:{minute:02d}"
+
+
+def _range_clock(text):
+    match = _CLOCK.match(text)
+    return _to_24h(*match.groups())
+
+
+def scan_time_spans(text):
+    """
+    Find every date, time and time-range expression in text in one pass.
+    Returns TimeSpan tuples in text order. A relative weekday such as
+    "next friday" is followed by a span for the bare weekday inside it.
+    """
+    spans = []
+    for match in _SCANNER.finditer(text):
+        group = match.lastgroup
+        start, end = match.span()
+
+        if group in ("from_end", "to_end", "between_end"):
+            start_group = group.replace("_end", "_start")
+            start_text = match.group(start_group)
+            end_text = match.group(group)
+            spans.append(TimeSpan("range", _RANGE_RANKS[start_group], start, end, match.group(0),
+                                  _range_clock(start_text), _range_clock(end_text),
+                                  (start_text, end_text)))
+        elif group == "clock":
+            spans.append(TimeSpan("time", _TIME_RANKS["clock"], start, end, match.group(0),
+                                  _to_24h(match.group("hour"), match.group("minute"), match.group("period")),
+                                  None, (match.group(0),)))
+        elif group == "hours":
+            spans.append(TimeSpan("time", _TIME_RANKS[group], start, end, match.group(0), None, None, ()))
+        elif group == "noon":
+            spans.append(TimeSpan("time", _TIME_RANKS[group], start, end, match.group(0), "12:00", None, ()))
+        elif group == "midnight":
+            spans.append(TimeSpan("time", _TIME_RANKS[group], start, end, match.group(0), "00:00", None, ()))
+        else:
+            spans.append(TimeSpan("date", _DATE_RANKS[group], start, end, match.group(0), None, None, ()))
+            # "next friday" also counts as a plain "friday", as a fallback
+            # for when the relative form cannot be resolved
+            if group == "relative_weekday":
+                day_start, day_end = match.span("relative_day")
+                spans.append(TimeSpan("date", _DATE_RANKS["weekday"], day_start, day_end,
+                                      match.group("relative_day"), None, None, ()))
+    return spans
+
+
+def depends_on_time_of_day(text):
+    """
+    Whether text holds a duration such as "in 2 hours", which resolves
+    against the reference time of day rather than just its day.
+    """
+    return any(span.kind == "time" and span.value is None for span in scan_time_spans(text))
+
+
+# A preposition leading into the dates and times that end a text
+_SUFFIX_LEAD = re.compile(r'\b(?:at|on|by|from)\s+$', re.IGNORECASE)
+
+# What may separate two of those dates and times, as in "on Friday, at 5pm and 6pm"
+_SUFFIX_GAP = re.compile(r'[\s,]*(?:\b(?:at|on|by|from|and)\b[\s,]*)*', re.IGNORECASE)
+
+
+def time_suffix_start(text):
+    """
+    Where the date and time expressions that end text begin, including the
+    preposition leading into them: 9 for "call mom at 5pm tomorrow".
+    Without such a preposition-led suffix, len(text).
+    """
+    start = len(text.rstrip())
+    suffix = len(text)
+    for span in sorted(scan_time_spans(text), key=lambda span: span.end, reverse=True):
+        if span.end < start and not _SUFFIX_GAP.fullmatch(text, span.end, start):
+            break
+        start = min(start, span.start)
+        lead = _SUFFIX_LEAD.search(text, 0, start)
+        if lead:
+            suffix = lead.start()
+    return suffix
+
+
+def spans_by_priority(spans, kind):
+    """Spans of one kind, best candidate first."""
+    return sorted((span for span in spans if span.kind == kind), key=lambda span: (span.rank, span.start))
+
+
+def clock_texts(spans):
+    """Raw clock-time strings (e.g. "3pm", "10:30am"), including both ends of ranges."""
+    return [clock for span in spans for clock in span.clocks]
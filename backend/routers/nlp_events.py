@@ -1,46 +1,211 @@
 from fastapi import APIRouter, Request
-from nlp.nlp import extract_entities, process_input_file
-import json
+from fastapi.responses import JSONResponse, StreamingResponse
+from nlp.nlp import extractor, process_input_file
+from nlp.cache import dedup_ratio
+from services.executor import executor, ExecutorBusyError
+from services.singleflight import singleflight
+from services.persistence import result_writer
+from services.jobs import job_manager, JobQueueFullError, JobInputError, resolve_input_path
+from services.live import live_sessions
+from models.models import typed_result
+from utils.serialization import dumps, FastJSONResponse
+from utils.prefork import memory_usage
 import os
 import logging
+from datetime import datetime
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Number of texts extracted together per chunk of a streamed response
+STREAM_CHUNK_SIZE = 32
+
+# Results per page of GET /jobs/{id}, by default and at most
+JOB_PAGE_SIZE = 100
+MAX_JOB_PAGE_SIZE = 1000
+
+def wants_stream(request: Request):
+    """Streaming is requested with ?stream=1 or an Accept: application/x-ndjson header."""
+    if request.query_params.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    return "application/x-ndjson" in request.headers.get("accept", "")
+
+async def stream_results(texts, mode, reference):
+    """
+    Yield one NDJSON record per text as soon as its chunk is extracted.
+    The next chunk is only started once the client has consumed the
+    previous one, so memory stays flat regardless of batch size.
+    """
+    for start in range(0, len(texts), STREAM_CHUNK_SIZE):
+        chunk = texts[start:start + STREAM_CHUNK_SIZE]
+        try:
+            parsed_chunk = await executor.extract_batch(chunk, mode, reference)
+        except Exception as e:
+            logger.error(f"Error streaming results: {e}")
+            yield dumps({"message": f"Error: {e}"}) + b"\n"
+            return
+        records = [{"original_text": text, "extracted_entities": typed_result(parsed)}
+                   for text, parsed in zip(chunk, parsed_chunk)]
+        # Snapshots would need the whole result set, but appends can go chunk by chunk
+        if result_writer.mode == "append":
+            result_writer.submit(records)
+        for record in records:
+            yield dumps(record) + b"\n"
+
 @router.post('/process')
 async def process_text(request: Request):
     """
-    Process text from request body and extract task information
+    Process text from request body and extract task information.
+    An optional "mode" ("full", "fast" or "segment") in the body or query
+    string overrides the server-wide extraction mode; "segment" splits each
+    text into its tasks and returns a list of them. An optional ISO 8601
+    "reference" time fixes what relative dates like "tomorrow" resolve to.
+    With ?stream=1 or Accept: application/x-ndjson, results are streamed
+    as NDJSON records and only append-mode persistence records them.
+    Otherwise texts already being extracted for a concurrent request wait
+    for that result, and the rest are coalesced with those of concurrent
+    requests into shared batches by the micro-batcher.
     """
     try: 
         data = await request.json()
         tasks = data.get("tasks", [])
+        texts = [entry.get("text", "") for entry in tasks]
+        texts = [text for text in texts if text]
+        mode = data.get("mode") or request.query_params.get("mode") or extractor.mode
+        # Without an explicit reference the batch resolves against the current time,
+        # which lets requests that arrive together share a batch
+        reference = datetime.fromisoformat(data["reference"]) if data.get("reference") else None
+
+        if wants_stream(request):
+            return StreamingResponse(stream_results(texts, mode, reference or datetime.now()),
+                                     media_type="application/x-ndjson")
+
         output_results = []
 
-        for entry in tasks:
-            text = entry.get("text", "")
-            if text:
-                parsed = extract_entities(text)
-                output_results.append({
-                    "original_text": text,
-                    "extracted_entities": parsed
-                })
+        for text, parsed in zip(texts, await singleflight.submit(texts, mode, reference)):
+            output_results.append({
+                "original_text": text,
+                "extracted_entities": typed_result(parsed)
+            })
 
-        # Write the output to a new JSON file
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        output_file = os.path.join(project_root, "output.json")
-        
-        with open(output_file, "w") as outfile:
-            json.dump({"results": output_results}, outfile, indent=4)
-            
-        logger.info(f"Results saved to {output_file}")
-        return {"message": "Data processed successfully", "results": output_results}
+        # Persist the results in the background instead of blocking the request
+        result_writer.submit(output_results)
+        return FastJSONResponse({
+            "message": "Data processed successfully",
+            "results": output_results,
+            # Share of the texts that repeated another one and were not extracted again
+            "dedup_ratio": round(dedup_ratio(texts), 4)
+        })
+    except ExecutorBusyError as e:
+        logger.warning(f"Rejecting request: {e}")
+        return JSONResponse(status_code=503, content={"message": f"Error: {e}"})
     except Exception as e:
         logger.error(f"Error processing request: {e}")
         return {"message": f"Error: {e}"}
 
+@router.post('/jobs')
+async def create_job(request: Request):
+    """
+    Start a background extraction job and return its id straight away.
+    The body holds either "tasks" (as for /process) or "file", an input
+    file relative to the project root such as "input.json" (JSON or JSONL),
+    plus the optional "mode" and "reference" of /process.
+    """
+    try:
+        data = await request.json()
+        mode = data.get("mode") or request.query_params.get("mode") or extractor.mode
+        reference = datetime.fromisoformat(data["reference"]) if data.get("reference") else datetime.now()
+        if data.get("file"):
+            job = job_manager.submit(path=resolve_input_path(data["file"]), mode=mode, reference=reference)
+        else:
+            texts = [entry.get("text", "") for entry in data.get("tasks", [])]
+            job = job_manager.submit(texts=texts, mode=mode, reference=reference)
+        return JSONResponse(status_code=202, content=job.summary())
+    except JobQueueFullError as e:
+        logger.warning(f"Rejecting job: {e}")
+        return JSONResponse(status_code=503, content={"message": f"Error: {e}"})
+    except (JobInputError, ValueError) as e:
+        return JSONResponse(status_code=400, content={"message": f"Error: {e}"})
+    except Exception as e:
+        logger.error(f"Error creating job: {e}")
+        return {"message": f"Error: {e}"}
+
+@router.get('/jobs/{job_id}')
+async def get_job(job_id: str, offset: int = 0, limit: int = JOB_PAGE_SIZE):
+    """
+    Status and progress of a job, with a page of its results so far.
+    Results are in input order; "next_offset" is the offset of the next
+    page, or null once every result of a finished job has been returned.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"message": f"Error: no job '{job_id}'"})
+    offset = max(offset, 0)
+    limit = min(max(limit, 1), MAX_JOB_PAGE_SIZE)
+    results = job.results[offset:offset + limit]
+    end = offset + len(results)
+    more = end < len(job.results) or not job.is_finished
+    return FastJSONResponse({
+        **job.summary(),
+        "offset": offset,
+        "results": results,
+        "next_offset": end if more else None
+    })
+
+@router.delete('/jobs/{job_id}')
+async def delete_job(job_id: str):
+    """Cancel a queued or running job, or discard a finished one and its results."""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"message": f"Error: no job '{job_id}'"})
+    return job.summary()
+
+@router.post('/live')
+async def live_preview(request: Request):
+    """
+    Preview the extraction of a task while it is being typed.
+    The body holds the current "text" and the "session" id returned by the
+    previous call (omitted on the first one), plus the optional "mode" and
+    "reference" of /process. A newer edit of the same session supersedes
+    this one: the response then has "status": "superseded" and no result,
+    and the client shows the response of the newer edit instead.
+    """
+    try:
+        data = await request.json()
+        mode = data.get("mode") or request.query_params.get("mode") or extractor.mode
+        reference = datetime.fromisoformat(data["reference"]) if data.get("reference") else None
+        session_id, status, parsed = await live_sessions.edit(data.get("session"), data.get("text", ""),
+                                                              mode, reference)
+        return FastJSONResponse({
+            "session": session_id,
+            "status": status,
+            "extracted_entities": typed_result(parsed) if parsed is not None else None
+        })
+    except ExecutorBusyError as e:
+        logger.warning(f"Rejecting live preview: {e}")
+        return JSONResponse(status_code=503, content={"message": f"Error: {e}"})
+    except Exception as e:
+        logger.error(f"Error previewing text: {e}")
+        return {"message": f"Error: {e}"}
+
+@router.delete('/live/{session_id}')
+async def close_live_session(session_id: str):
+    """Forget a live preview session and cancel its pending edit."""
+    if not live_sessions.close(session_id):
+        return JSONResponse(status_code=404, content={"message": f"Error: no session '{session_id}'"})
+    return {"message": "Session closed"}
+
+@router.get('/model')
+async def model_memory():
+    """
+    Vocab size, model rotations and memory of every process that runs
+    extraction: each pool worker as of the last batch it ran, or this
+    server process without a pool.
+    """
+    return {"workers": [dict(stats, memory=memory_usage(stats["pid"])) for stats in executor.model_stats()]}
+
 @router.get('/process_file')
 async def process_input_file_endpoint():
     """
@@ -51,7 +216,7 @@ async def process_input_file_endpoint():
         input_file = os.path.join(project_root, "input.json")
         output_file = os.path.join(project_root, "output.json")
         
-        success = process_input_file(input_file, output_file)
+        success = await executor.run(process_input_file, input_file, output_file)
         
         if success:
             return {
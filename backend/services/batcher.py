@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import os
+from services.executor import executor
+from utils.metrics import registry, SIZE_BUCKETS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# How long the first text of a batch waits for others to join it (0 disables coalescing)
+BATCH_WINDOW_MS = float(os.getenv("NLP_BATCH_WINDOW_MS", "5"))
+
+# A batch is sent as soon as it holds this many texts
+MAX_BATCH_SIZE = int(os.getenv("NLP_MAX_BATCH_SIZE", "64"))
+
+BATCH_TEXTS = registry.histogram("nlp_microbatch_texts", "Texts per coalesced batch", buckets=SIZE_BUCKETS)
+BATCH_REQUESTS = registry.histogram("nlp_microbatch_requests", "Requests sharing one coalesced batch",
+                                    buckets=SIZE_BUCKETS)
+BATCH_FLUSHES = registry.counter("nlp_microbatch_flushes_total", "Coalesced batches sent, by what triggered them",
+                                 labels=("trigger",))
+
+
+class MicroBatcher:
+    """
+    Coalesces texts from concurrent requests into shared extraction batches.
+    The first text to arrive opens a short window; texts from other requests
+    that arrive within it (up to max_batch_size) are parsed in the same
+    nlp.pipe call and each caller gets back only its own results. Requests
+    are only grouped when they share the extraction mode and reference time.
+    """
+
+    def __init__(self, run_batch, window_ms=BATCH_WINDOW_MS, max_batch_size=MAX_BATCH_SIZE):
+        self.run_batch = run_batch
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self._groups = {}
+        self._timers = {}
+
+    @property
+    def enabled(self):
+        return self.window_ms > 0 and self.max_batch_size > 1
+
+    async def submit(self, texts, mode=None, reference=None):
+        """Extract texts as part of a shared batch and return their results in order."""
+        if not texts:
+            return []
+        if not self.enabled or len(texts) >= self.max_batch_size:
+            # Already a full batch on its own
+            return await self.run_batch(texts, mode, reference)
+
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        key = (mode, reference)
+        group = self._groups.setdefault(key, {"texts": 0, "entries": []})
+        group["entries"].append((texts, future))
+        group["texts"] += len(texts)
+
+        if group["texts"] >= self.max_batch_size:
+            self._flush(key, "size")
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window_ms / 1000, self._flush, key, "window")
+        return await future
+
+    def _flush(self, key, trigger):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        group = self._groups.pop(key, None)
+        if group:
+            BATCH_FLUSHES.inc(trigger=trigger)
+            asyncio.ensure_future(self._run(key, group["entries"]))
+
+    async def _run(self, key, entries):
+        mode, reference = key
+        texts = [text for entry_texts, _ in entries for text in entry_texts]
+        BATCH_TEXTS.observe(len(texts))
+        BATCH_REQUESTS.observe(len(entries))
+        try:
+            results = await self.run_batch(texts, mode, reference)
+        except Exception as e:
+            for _, future in entries:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for entry_texts, future in entries:
+            # A caller that went away has a cancelled future
+            if not future.done():
+                future.set_result(results[offset:offset + len(entry_texts)])
+            offset += len(entry_texts)
+
+
+batcher = MicroBatcher(executor.extract_batch)
+
+registry.gauge("nlp_microbatch_window_ms", "Coalescing window of the micro-batcher",
+               callback=lambda: batcher.window_ms)
+registry.gauge("nlp_microbatch_max_size", "Maximum texts per coalesced batch",
+               callback=lambda: batcher.max_batch_size)
+registry.gauge("nlp_microbatch_open_batches", "Coalesced batches still waiting for their window to close",
+               callback=lambda: len(batcher._groups))
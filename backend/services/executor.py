@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from utils.metrics import registry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Number of worker processes (0 runs extraction in a thread of the server process)
+POOL_SIZE = int(os.getenv("NLP_POOL_SIZE", os.cpu_count() or 1))
+
+# Maximum number of extraction jobs allowed to be running or waiting at once
+QUEUE_DEPTH = int(os.getenv("NLP_QUEUE_DEPTH", "64"))
+
+
+class ExecutorBusyError(Exception):
+    """Raised when the extraction queue is already at its configured depth."""
+
+
+def _init_worker():
+    """Load the spaCy model once when a worker process starts."""
+    from nlp.nlp import extract_entities
+    extract_entities("warm up the pipeline")
+
+
+def _model_stats():
+    from nlp.nlp import model_stats
+    return model_stats()
+
+
+def _run_batch(texts, mode, reference):
+    """Run batch extraction inside a worker process."""
+    from nlp.nlp import extract_entities_batch
+    return extract_entities_batch(texts, mode=mode, reference=reference)
+
+
+def _run_batch_with_metrics(texts, mode, reference):
+    """Run batch extraction and ship the metrics it recorded and its model stats back to the server."""
+    results = _run_batch(texts, mode, reference)
+    return results, registry.drain(), _model_stats()
+
+
+class ExtractionExecutor:
+    """
+    Runs CPU-bound extraction away from the event loop.
+    Work goes to a pool of preloaded worker processes so concurrent requests
+    can use several cores while the server keeps answering other clients.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, queue_depth=QUEUE_DEPTH):
+        self.pool_size = pool_size
+        self.queue_depth = queue_depth
+        self._pool = None
+        self._pending = 0
+        self._models = {}
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def start(self):
+        """Start the worker processes and have each one load the model."""
+        if self._pool is not None or self.pool_size <= 0:
+            return
+        context = multiprocessing.get_context("spawn")
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.pool_size,
+            mp_context=context,
+            initializer=_init_worker
+        )
+        # Submitting one job per worker makes the pool start all of them now
+        # instead of on the first requests
+        for _ in range(self.pool_size):
+            self._pool.submit(_model_stats).add_done_callback(self._record_model)
+        logger.info(f"Started extraction pool with {self.pool_size} workers")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+            self._models = {}
+
+    def model_stats(self):
+        """
+        Vocab size and rotations of each process that runs extraction: the
+        pool workers, as of the last batch each one ran, or this process
+        when there is no pool.
+        """
+        if self.pool_size <= 0:
+            return [_model_stats()]
+        return sorted(self._models.values(), key=lambda stats: stats["pid"])
+
+    def _record_model(self, future):
+        if not future.cancelled() and future.exception() is None:
+            stats = future.result()
+            self._models[stats["pid"]] = stats
+
+    async def run(self, func, *args):
+        """
+        Run func(*args) on the pool and await its result.
+        Raises ExecutorBusyError when the queue is full.
+        """
+        if self._pending >= self.queue_depth:
+            raise ExecutorBusyError(f"extraction queue is full ({self.queue_depth} pending jobs)")
+        self.start()
+        self._pending += 1
+        try:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self._pool, func, *args)
+        finally:
+            self._pending -= 1
+
+    async def extract_batch(self, texts, mode=None, reference=None):
+        """Extract entities for a list of texts on the pool."""
+        self.start()
+        if self._pool is None:
+            return await self.run(_run_batch, texts, mode, reference)
+        # Stage timings and the model's vocab are recorded in the worker, so bring them into this process
+        results, metrics, model = await self.run(_run_batch_with_metrics, texts, mode, reference)
+        registry.merge(metrics)
+        self._models[model["pid"]] = model
+        return results
+
+
+executor = ExtractionExecutor()
+
+registry.gauge("nlp_executor_pending_jobs", "Extraction jobs running or waiting on the executor",
+               callback=lambda: executor.pending)
+registry.gauge("nlp_vocab_strings", "Strings in the spaCy vocab of each process that runs extraction",
+               labels=("pid",), callback=lambda: {(stats["pid"],): stats["strings"] for stats in executor.model_stats()})
+registry.gauge("nlp_vocab_lexemes", "Lexemes in the spaCy vocab of each process that runs extraction",
+               labels=("pid",), callback=lambda: {(stats["pid"],): stats["lexemes"] for stats in executor.model_stats()})
@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from nlp.taskio import detect_format, iter_tasks
+from models.models import typed_result
+from services.executor import executor, ExecutorBusyError
+from services.persistence import result_writer, PROJECT_ROOT
+from utils.metrics import registry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Jobs extracted at the same time; the others wait in the queue
+JOB_CONCURRENCY = int(os.getenv("NLP_JOB_CONCURRENCY", "2"))
+
+# Texts handed to the executor at a time, which is also how often progress and cancellation are checked
+JOB_CHUNK_SIZE = int(os.getenv("NLP_JOB_CHUNK_SIZE", "64"))
+
+# Seconds a finished job and its results are kept
+JOB_TTL = float(os.getenv("NLP_JOB_TTL", "3600"))
+
+# Maximum number of jobs queued or running at once
+MAX_JOBS = int(os.getenv("NLP_MAX_JOBS", "100"))
+
+# Seconds a job waits before retrying a chunk the executor rejected as busy
+BUSY_RETRY_SECONDS = 0.5
+
+JOB_STATUSES = ("queued", "running", "completed", "failed", "cancelled")
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+JOBS_FINISHED = registry.counter("nlp_jobs_finished_total", "Background jobs by final status", labels=("status",))
+JOB_SECONDS = registry.histogram("nlp_job_duration_seconds", "Time from a job starting to finishing",
+                                 buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0))
+
+
+class JobQueueFullError(Exception):
+    """Raised when MAX_JOBS jobs are already queued or running."""
+
+
+class JobInputError(Exception):
+    """Raised when a job's input file is missing or outside the project directory."""
+
+
+class Job:
+    """A batch of texts extracted in the background, with its progress and results."""
+
+    def __init__(self, texts=None, path=None, mode=None, reference=None):
+        self.id = uuid.uuid4().hex
+        self.texts = texts
+        self.path = path
+        self.mode = mode
+        self.reference = reference
+        self.status = "queued"
+        # Empty texts are skipped; a file's tasks are only counted once it is read
+        self.total = sum(1 for text in texts if text) if texts is not None else None
+        self.done = 0
+        self.results = []
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._task = None
+
+    @property
+    def is_finished(self):
+        return self.status in FINISHED_STATUSES
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "progress": round(self.done / self.total, 4) if self.total else (1.0 if self.is_finished else 0.0),
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished
+        }
+
+
+def resolve_input_path(path):
+    """
+    The absolute path of a job's input file, given relative to the project
+    root the way /process_file reads input.json. Paths that lead outside the
+    project directory are rejected.
+    """
+    resolved = os.path.realpath(os.path.join(PROJECT_ROOT, path))
+    if os.path.commonpath([resolved, os.path.realpath(PROJECT_ROOT)]) != os.path.realpath(PROJECT_ROOT):
+        raise JobInputError(f"'{path}' is outside the project directory")
+    if not os.path.isfile(resolved):
+        raise JobInputError(f"'{path}' does not exist")
+    return resolved
+
+
+def _read_tasks(path):
+    """(index, text) of every non-empty task of an input file."""
+    with open(path, "r") as infile:
+        return [(index, text) for index, text in iter_tasks(infile, detect_format(path)) if text]
+
+
+class JobManager:
+    """
+    Runs extraction jobs in the background of the server process.
+    Submitted jobs wait in a FIFO queue and at most `concurrency` of them
+    run at once; each one sends its texts to the executor chunk by chunk,
+    so progress can be reported and a cancelled job stops after its
+    current chunk. Finished jobs are kept for `ttl` seconds and then
+    dropped the next time the manager is used. Jobs live in this process
+    only: with several server workers a job is only visible to the worker
+    that accepted it.
+    """
+
+    def __init__(self, concurrency=JOB_CONCURRENCY, chunk_size=JOB_CHUNK_SIZE, ttl=JOB_TTL, max_jobs=MAX_JOBS):
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._jobs = {}
+        self._queue = deque()
+        self._running = 0
+
+    def submit(self, texts=None, path=None, mode=None, reference=None):
+        """
+        Queue a job for a list of texts or an input file and return it.
+        Raises JobQueueFullError when too many jobs are pending.
+        """
+        self.expire()
+        if self.count("queued") + self.count("running") >= self.max_jobs:
+            raise JobQueueFullError(f"job queue is full ({self.max_jobs} pending jobs)")
+        job = Job(texts, path, mode, reference)
+        self._jobs[job.id] = job
+        self._queue.append(job)
+        self._start_next()
+        return job
+
+    def get(self, job_id):
+        """The job with this id, or None if it does not exist or has expired."""
+        self.expire()
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued or running job; a finished job is removed instead.
+        Returns the job, or None if there is no such job.
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.is_finished:
+            del self._jobs[job_id]
+        elif job.status == "queued":
+            self._queue.remove(job)
+            self._finish(job, "cancelled")
+        elif job._task is not None:
+            # The chunk being extracted completes, but its results are discarded
+            job._task.cancel()
+        return job
+
+    def shutdown(self):
+        """Cancel every queued and running job."""
+        for job in list(self._jobs.values()):
+            if not job.is_finished:
+                self.cancel(job.id)
+
+    def expire(self):
+        """Drop finished jobs older than the TTL."""
+        if self.ttl <= 0:
+            return
+        cutoff = time.time() - self.ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.is_finished and job.finished < cutoff:
+                del self._jobs[job_id]
+
+    def count(self, status):
+        return sum(1 for job in self._jobs.values() if job.status == status)
+
+    def _start_next(self):
+        while self._queue and self._running < self.concurrency:
+            job = self._queue.popleft()
+            self._running += 1
+            job.status = "running"
+            job.started = time.time()
+            job._task = asyncio.ensure_future(self._run(job))
+
+    async def _run(self, job):
+        try:
+            if job.texts is None:
+                loop = asyncio.get_event_loop()
+                tasks = await loop.run_in_executor(None, _read_tasks, job.path)
+            else:
+                tasks = [(index, text) for index, text in enumerate(job.texts) if text]
+            job.total = len(tasks)
+            job.texts = None
+
+            for start in range(0, len(tasks), self.chunk_size):
+                chunk = tasks[start:start + self.chunk_size]
+                parsed_chunk = await self._extract([text for _, text in chunk], job.mode, job.reference)
+                records = [{"index": index, "original_text": text,
+                            "extracted_entities": typed_result(parsed)}
+                           for (index, text), parsed in zip(chunk, parsed_chunk)]
+                job.results.extend(records)
+                job.done += len(records)
+                # As with streamed responses, only append mode can record results chunk by chunk
+                if result_writer.mode == "append":
+                    result_writer.submit(records)
+            self._finish(job, "completed")
+        except asyncio.CancelledError:
+            self._finish(job, "cancelled")
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}")
+            job.error = str(e)
+            self._finish(job, "failed")
+        finally:
+            self._running -= 1
+            self._start_next()
+
+    async def _extract(self, texts, mode, reference):
+        # Interactive requests have priority, so a job waits for room on the executor
+        while True:
+            try:
+                return await executor.extract_batch(texts, mode, reference)
+            except ExecutorBusyError:
+                await asyncio.sleep(BUSY_RETRY_SECONDS)
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished = time.time()
+        job._task = None
+        JOBS_FINISHED.inc(status=status)
+        if job.started is not None:
+            JOB_SECONDS.observe(job.finished - job.started)
+
+
+job_manager = JobManager()
+
+registry.gauge("nlp_jobs", "Background jobs currently known, by status", labels=("status",),
+               callback=lambda: {(status,): job_manager.count(status) for status in JOB_STATUSES})
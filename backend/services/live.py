@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from nlp.nlp import retime_entities
+from nlp.timescan import time_suffix_start
+from services.singleflight import singleflight
+from utils.metrics import registry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# How long an edit waits for a newer one from the same session before it is extracted (0 disables)
+LIVE_DEBOUNCE_MS = float(os.getenv("NLP_LIVE_DEBOUNCE_MS", "50"))
+
+# Seconds an idle session is kept
+LIVE_SESSION_TTL = float(os.getenv("NLP_LIVE_SESSION_TTL", "300"))
+
+# Sessions kept at once; the least recently used one is dropped beyond this
+MAX_LIVE_SESSIONS = int(os.getenv("NLP_MAX_LIVE_SESSIONS", "10000"))
+
+# Trailing characters that are stripped before comparing an edit with the previous one.
+# "." is not among them: it completes abbreviations such as "5 p.m." that the time scan reads.
+_TRAILING = " \t\r\n,;:!?"
+
+LIVE_EDITS = registry.counter("nlp_live_edits_total",
+                              "Live preview edits by outcome (extracted, reused, retimed, superseded)",
+                              labels=("outcome",))
+
+
+def preview_key(text):
+    """
+    The part of an edit that decides its preview: trailing whitespace and
+    most punctuation only show the user is still typing, so "call mom",
+    "call mom " and "call mom," share a preview. A final "." can finish a
+    time such as "5 p.m.", so it always counts.
+    """
+    return text.rstrip(_TRAILING)
+
+
+class LiveSession:
+    def __init__(self, session_id):
+        self.id = session_id
+        self.seq = 0
+        self.task = None
+        self.key = None
+        self.result = None
+        self.used = time.monotonic()
+
+
+class LiveSessions:
+    """
+    Previews for texts that are edited keystroke by keystroke.
+    Each client session keeps its latest preview and the extraction in
+    flight for it. A new edit supersedes the session's pending one, which
+    is cancelled and answered as superseded, and an edit only starts
+    extracting once it has not been superseded for debounce_ms. An edit
+    that leaves the text the same up to trailing whitespace and punctuation
+    other than "." reuses the previous preview without any extraction. One
+    that only changes the dates and times at the end of the text, as in
+    "call mom at 5pm" -> "call mom at 6pm tomorrow", keeps the previous
+    task, people and places and only re-runs the time scan and date
+    resolution. The others go through the single-flight layer and the
+    micro-batcher, so edits from different sessions share extractions and
+    batches.
+    """
+
+    def __init__(self, debounce_ms=LIVE_DEBOUNCE_MS, ttl=LIVE_SESSION_TTL, max_sessions=MAX_LIVE_SESSIONS):
+        self.debounce_ms = debounce_ms
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    async def edit(self, session_id, text, mode=None, reference=None):
+        """
+        Preview text as the latest edit of a session (a new session if
+        session_id is None). Returns (session_id, outcome, result), where
+        outcome is "extracted", "reused", "retimed" or "superseded" and
+        result is None for a superseded edit.
+        """
+        session = self._session(session_id)
+        session.seq += 1
+        seq = session.seq
+        if session.task is not None:
+            session.task.cancel()
+            session.task = None
+
+        key = (preview_key(text), mode, reference)
+        if key == session.key:
+            LIVE_EDITS.inc(outcome="reused")
+            return session.id, "reused", session.result
+
+        result = self._retime(session, key, text)
+        if result is not None:
+            session.key = key
+            session.result = result
+            LIVE_EDITS.inc(outcome="retimed")
+            return session.id, "retimed", result
+
+        session.task = asyncio.ensure_future(self._extract(text, mode, reference))
+        try:
+            result = await session.task
+        except asyncio.CancelledError:
+            # A newer edit cancelled this one; a cancelled request is cancelled for real
+            if seq == session.seq:
+                raise
+            LIVE_EDITS.inc(outcome="superseded")
+            return session.id, "superseded", None
+        finally:
+            if seq == session.seq:
+                session.task = None
+
+        if seq == session.seq:
+            session.key = key
+            session.result = result
+        LIVE_EDITS.inc(outcome="extracted")
+        return session.id, "extracted", result
+
+    def close(self, session_id):
+        """Forget a session, cancelling its pending edit. Returns False if there was none."""
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        if session.task is not None:
+            session.task.cancel()
+        return True
+
+    def pending(self):
+        """Sessions with an edit being debounced or extracted."""
+        return sum(1 for session in self._sessions.values() if session.task is not None)
+
+    def _retime(self, session, key, text):
+        """
+        The session's preview with its date and time found again in text, if
+        the edit only changed the dates and times ending the previous text;
+        otherwise None.
+        """
+        result = session.result
+        if session.key is None or key[1:] != session.key[1:] or not isinstance(result, dict):
+            return None
+        preview, previous = key[0], session.key[0]
+        start, previous_start = time_suffix_start(preview), time_suffix_start(previous)
+        if (start == len(preview) or previous_start == len(previous) or
+                preview[:start].rstrip() != previous[:previous_start].rstrip()):
+            return None
+
+        # Nothing of the old dates and times may have been taken for part of the task, a person or a place
+        old_words = set(previous[previous_start:].lower().split())
+        kept = [result["task"] or ""] + result["participants"] + result["locations"]
+        if any(word in old_words for value in kept for word in value.lower().split()):
+            return None
+
+        retimed = retime_entities(result, text, key[2])
+        # Whether there is a time at all changes which words the parse counts as places
+        if bool(retimed["time"] or retimed["end_time"]) != bool(result["time"] or result["end_time"]):
+            return None
+        return retimed
+
+    async def _extract(self, text, mode, reference):
+        if self.debounce_ms > 0:
+            await asyncio.sleep(self.debounce_ms / 1000)
+        results = await singleflight.submit([text], mode, reference)
+        return results[0]
+
+    def _session(self, session_id):
+        self._expire()
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None:
+            session = LiveSession(session_id or uuid.uuid4().hex)
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session.id)
+        session.used = time.monotonic()
+        return session
+
+    def _expire(self):
+        if self.ttl <= 0:
+            return
+        cutoff = time.monotonic() - self.ttl
+        # Sessions are in order of last use, so the idle ones are at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.used >= cutoff or session.task is not None:
+                break
+            self._sessions.popitem(last=False)
+
+
+live_sessions = LiveSessions()
+
+registry.gauge("nlp_live_sessions", "Live preview sessions currently kept", callback=lambda: len(live_sessions))
+registry.gauge("nlp_live_pending_edits", "Live preview edits being debounced or extracted",
+               callback=live_sessions.pending)
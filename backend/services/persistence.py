@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import stat
+import tempfile
+import threading
+from collections import deque
+from utils.metrics import registry
+from utils.serialization import dumps, json_default
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# "overwrite" keeps output.json as a snapshot of the latest request,
+# "append" adds every result to a JSONL file, "off" disables persistence
+PERSIST_MODES = ("overwrite", "append", "off")
+PERSIST_MODE = os.getenv("NLP_PERSIST_MODE", "overwrite")
+
+DEFAULT_OUTPUT_FILES = {
+    "overwrite": os.path.join(PROJECT_ROOT, "output.json"),
+    "append": os.path.join(PROJECT_ROOT, "output.jsonl"),
+}
+
+PERSISTED_BATCHES = registry.counter("nlp_persisted_batches_total",
+                                     "Result batches handed to the writer, by outcome (written, coalesced, failed)",
+                                     labels=("outcome",))
+
+
+class ResultWriter:
+    """
+    Write-behind persistence for extraction results.
+    Requests hand their results to submit() and return straight away; a
+    background thread does the disk I/O. In overwrite mode only the newest
+    pending snapshot is written (older ones are coalesced away) and each
+    write goes to a temp file that is renamed over the target, so readers
+    never see a half-written file. In append mode every pending batch is
+    written in one go.
+    """
+
+    def __init__(self, mode=PERSIST_MODE, path=None):
+        self.configure(mode, path)
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def configure(self, mode, path=None):
+        """Set the persistence mode and target file (before the writer starts)."""
+        if mode not in PERSIST_MODES:
+            raise ValueError(f"Unknown persistence mode '{mode}', expected one of {PERSIST_MODES}")
+        self.mode = mode
+        self.path = path or os.getenv("NLP_OUTPUT_FILE") or DEFAULT_OUTPUT_FILES.get(mode)
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Write whatever is still pending and stop the background thread."""
+        if self._thread is None:
+            return
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self._thread.join()
+        self._thread = None
+
+    def submit(self, results):
+        """Queue a list of result records for writing."""
+        if not self.enabled:
+            return
+        self.start()
+        with self._condition:
+            if self.mode == "overwrite" and self._pending:
+                # Only the latest snapshot matters
+                PERSISTED_BATCHES.inc(len(self._pending), outcome="coalesced")
+                self._pending.clear()
+            self._pending.append(results)
+            self._condition.notify()
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if not self._pending and self._stopping:
+                    return
+                batches = list(self._pending)
+                self._pending.clear()
+            try:
+                if self.mode == "overwrite":
+                    self._write_snapshot(batches[-1])
+                else:
+                    self._append(batches)
+                PERSISTED_BATCHES.inc(len(batches), outcome="written")
+            except Exception as e:
+                PERSISTED_BATCHES.inc(len(batches), outcome="failed")
+                logger.error(f"Error writing results to {self.path}: {e}")
+
+    def _write_snapshot(self, results):
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".output-", suffix=".tmp")
+        try:
+            # mkstemp creates the file 0600; give the snapshot the permissions a plain open() would
+            os.fchmod(fd, _snapshot_mode(self.path))
+            with os.fdopen(fd, "w") as outfile:
+                json.dump({"results": results}, outfile, indent=4, default=json_default)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        logger.info(f"Results saved to {self.path}")
+
+    def _append(self, batches):
+        with open(self.path, "ab") as outfile:
+            for results in batches:
+                for record in results:
+                    outfile.write(dumps(record) + b"\n")
+
+
+def _snapshot_mode(path):
+    """The existing target's permission bits, or the umask default for a new file."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+result_writer = ResultWriter()
+
+registry.gauge("nlp_persist_pending_batches", "Result batches waiting to be written",
+               callback=lambda: result_writer.pending)
@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import logging
+import os
+from collections import Counter
+from datetime import datetime
+from nlp.cache import cache_key, copy_result
+from services.batcher import batcher
+from utils.metrics import registry, SIZE_BUCKETS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Keys whose coalesced waiters are tracked individually, and how many of them are exported as metrics
+HOT_KEYS_TRACKED = int(os.getenv("NLP_SINGLEFLIGHT_HOT_KEYS", "1000"))
+HOT_KEYS_EXPORTED = 10
+
+# Hex digits of a key's hash used as its metric label
+_KEY_LABEL_CHARS = 12
+
+COALESCED = registry.counter("nlp_singleflight_coalesced_total",
+                             "Texts that waited for an extraction another request already had in flight")
+FLIGHTS = registry.counter("nlp_singleflight_flights_total", "Extractions started by the single-flight layer")
+FLIGHT_WAITERS = registry.histogram("nlp_singleflight_waiters", "Requests that joined one in-flight extraction",
+                                    buckets=SIZE_BUCKETS)
+
+
+class _Flight:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self, future):
+        self.future = future
+        self.waiters = 0
+
+
+def key_label(key):
+    """
+    A short label for a cache key: a hash of it, so the text of a task,
+    which may be personal, never ends up in the metrics.
+    """
+    return hashlib.sha256("\x1f".join(str(part) for part in key).encode("utf-8")).hexdigest()[:_KEY_LABEL_CHARS]
+
+
+class SingleFlight:
+    """
+    Lets concurrent requests for the same text share one extraction.
+    Texts are keyed like the result cache (normalized text, reference day,
+    or minute for texts with a duration, and mode). A text whose key is
+    already being extracted for another request waits for that extraction
+    instead of starting its own, so a
+    burst of identical requests, such as right after a restart before any
+    cache is warm, costs one extraction. The rest are sent on to run_batch
+    (the micro-batcher) together.
+    """
+
+    def __init__(self, run_batch, hot_keys=HOT_KEYS_TRACKED):
+        self.run_batch = run_batch
+        self.hot_keys = hot_keys
+        self._flights = {}
+        self.flights = 0
+        self.coalesced = 0
+        self.key_waiters = Counter()
+
+    async def submit(self, texts, mode=None, reference=None):
+        """Extract texts, joining in-flight extractions of the same keys, and return their results in order."""
+        if not texts:
+            return []
+        day = reference or datetime.now()
+        keys = [cache_key(text, day, mode) for text in texts]
+
+        futures = []
+        joined = {}
+        started = {}
+        for i, key in enumerate(keys):
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight(asyncio.get_event_loop().create_future())
+                started[key] = i
+            elif key not in started and key not in joined:
+                flight.waiters += 1
+                joined[key] = None
+            futures.append(flight.future)
+
+        if joined:
+            self.coalesced += len(joined)
+            COALESCED.inc(len(joined))
+            self._count_waiters(list(joined))
+        if started:
+            self.flights += len(started)
+            FLIGHTS.inc(len(started))
+            asyncio.ensure_future(self._fly(list(started), [texts[i] for i in started.values()], mode, reference))
+
+        # Shielded, so a caller that goes away does not cancel the flight for the others
+        results = await asyncio.gather(*(asyncio.shield(future) for future in futures))
+        # Only the request that started a flight gets its result as is
+        return [result if started.get(keys[i]) == i else copy_result(result) for i, result in enumerate(results)]
+
+    def stats(self):
+        return {
+            "in_flight": len(self._flights),
+            "flights": self.flights,
+            "coalesced": self.coalesced,
+            "hot_keys": [(key_label(key), waiters) for key, waiters in self.key_waiters.most_common(HOT_KEYS_EXPORTED)]
+        }
+
+    async def _fly(self, keys, texts, mode, reference):
+        try:
+            results = await self.run_batch(texts, mode, reference)
+        except asyncio.CancelledError:
+            for key in keys:
+                self._land(key).cancel()
+            raise
+        except Exception as e:
+            # Everyone waiting on these keys gets the error, such as ExecutorBusyError
+            for key in keys:
+                self._land(key).set_exception(e)
+            return
+        for key, result in zip(keys, results):
+            self._land(key).set_result(result)
+
+    def _land(self, key):
+        flight = self._flights.pop(key)
+        FLIGHT_WAITERS.observe(flight.waiters)
+        return flight.future
+
+    def _count_waiters(self, keys):
+        self.key_waiters.update(keys)
+        if len(self.key_waiters) > 2 * self.hot_keys:
+            # Keep the hottest keys rather than every text ever coalesced
+            self.key_waiters = Counter(dict(self.key_waiters.most_common(self.hot_keys)))
+
+
+singleflight = SingleFlight(batcher.submit)
+
+registry.gauge("nlp_singleflight_in_flight", "Keys currently being extracted by the single-flight layer",
+               callback=lambda: len(singleflight._flights))
+registry.gauge("nlp_singleflight_key_waiters", "Coalesced waiters of the hottest keys, by key hash",
+               labels=("key",),
+               callback=lambda: {(label,): waiters for label, waiters in singleflight.stats()["hot_keys"]})
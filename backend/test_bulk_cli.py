@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+import sys
+import os
+import json
+import tempfile
+from datetime import datetime
+
+# Add the parent directory to the path to access modules
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from nlp.__main__ import main as cli_main
+from nlp.nlp import process_input_stream
+from nlp.taskio import iter_shards
+
+REFERENCE = datetime(2025, 1, 6, 9, 0)
+
+TEXTS = ["gym workout at 6am tomorrow", "", "Meeting with John tomorrow at 2pm",
+         "dentist appointment on Friday at 3pm", "call mom", "team lunch at noon near the quad"] * 5
+
+
+def _run(jobs, batch_size):
+    written = []
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "tasks.jsonl")
+        output_path = os.path.join(tmp, "results.jsonl")
+        with open(input_path, "w") as f:
+            f.write("".join(json.dumps({"text": text}) + "\n" for text in TEXTS))
+        assert process_input_stream(input_path, output_path, resume=False, batch_size=batch_size,
+                                    reference=REFERENCE, jobs=jobs,
+                                    progress=lambda entries, count, seconds: written.append(count))
+        with open(output_path) as f:
+            return written[-1], [json.loads(line) for line in f]
+
+
+def test_shards_skip_empty_tasks():
+    shards = list(iter_shards([(0, "a"), (1, ""), (2, "b"), (3, "c")], 2))
+    assert shards == [([0, 2], ["a", "b"]), ([3], ["c"])]
+
+
+def test_parallel_output_keeps_input_order():
+    """Sharding across workers gives the same records, in the same order, as one process."""
+    written, serial = _run(jobs=1, batch_size=4)
+    assert written == len([text for text in TEXTS if text])
+    assert [record["index"] for record in serial] == [i for i, text in enumerate(TEXTS) if text]
+
+    _, parallel = _run(jobs=2, batch_size=3)
+    assert parallel == serial
+
+
+def test_cli_resumes_after_truncated_line():
+    """An interrupted run appends after the last complete record instead of starting over."""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "tasks.jsonl")
+        with open(input_path, "w") as f:
+            f.write("".join(json.dumps({"text": text}) + "\n" for text in TEXTS))
+        args = ["--jobs", "1", "--batch-size", "4", "--reference", REFERENCE.isoformat(), "--quiet"]
+
+        full_path = os.path.join(tmp, "full.jsonl")
+        assert cli_main([input_path, full_path] + args) == 0
+        with open(full_path, "rb") as f:
+            full = f.read()
+
+        resumed_path = os.path.join(tmp, "resumed.jsonl")
+        lines = full.splitlines(keepends=True)
+        with open(resumed_path, "wb") as f:
+            f.write(b"".join(lines[:7]) + lines[7][:15])
+        assert cli_main([input_path, resumed_path] + args) == 0
+        with open(resumed_path, "rb") as f:
+            assert f.read() == full
+
+        assert cli_main([input_path, resumed_path, "--restart"] + args) == 0
+        with open(resumed_path, "rb") as f:
+            assert f.read() == full
+
+
+def main():
+    """Run the bulk extraction CLI checks."""
+    print("=== Bulk CLI Test ===")
+    test_shards_skip_empty_tasks()
+    test_parallel_output_keeps_input_order()
+    test_cli_resumes_after_truncated_line()
+    print("All bulk CLI checks passed.")
+
+
+if __name__ == "__main__":
+    main()
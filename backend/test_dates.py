@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+import sys
+import os
+from datetime import datetime, date
+
+# Add the parent directory to the path to access modules
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from nlp.dates import resolve_date
+
+
+def _day(phrase, reference):
+    return resolve_date(phrase, reference).date()
+
+
+def test_next_month_clamps_the_day():
+    """The same day next month, or the last day of a shorter month."""
+    assert _day("next month", datetime(2025, 1, 31)) == date(2025, 2, 28)
+    assert _day("next month", datetime(2024, 1, 31)) == date(2024, 2, 29)
+    assert _day("next month", datetime(2025, 3, 31)) == date(2025, 4, 30)
+    assert _day("next month", datetime(2025, 12, 15)) == date(2026, 1, 15)
+
+
+def test_weekdays_on_the_same_weekday():
+    """On a Friday, "friday" is today and "next friday" a week later."""
+    friday = datetime(2025, 1, 10, 9)
+    assert _day("friday", friday) == date(2025, 1, 10)
+    assert _day("this Friday", friday) == date(2025, 1, 10)
+    assert _day("next friday", friday) == date(2025, 1, 17)
+    assert _day("next monday", friday) == date(2025, 1, 13)
+
+
+def test_relative_days_cross_month_and_year():
+    assert _day("tomorrow", datetime(2025, 2, 28, 23, 30)) == date(2025, 3, 1)
+    assert _day("next week", datetime(2025, 12, 29)) == date(2026, 1, 5)
+    assert resolve_date("noon", datetime(2025, 1, 1, 9, 45)) == datetime(2025, 1, 1, 12)
+
+
+def test_fallback_follows_time_of_day():
+    """A memoised duration is not reused for a later time on the same day."""
+    assert resolve_date("in 2 hours", datetime(2025, 1, 1, 9)).strftime("%H:%M") == "11:00"
+    assert resolve_date("in 2 hours", datetime(2025, 1, 1, 15)).strftime("%H:%M") == "17:00"
+    assert resolve_date("in 2 hours", datetime(2025, 1, 1, 9)).strftime("%H:%M") == "11:00"
+
+
+def main():
+    """Run the date resolution checks."""
+    print("=== Date Resolution Test ===")
+    test_next_month_clamps_the_day()
+    test_weekdays_on_the_same_weekday()
+    test_relative_days_cross_month_and_year()
+    test_fallback_follows_time_of_day()
+    print("All date resolution checks passed.")
+
+
+if __name__ == "__main__":
+    main()
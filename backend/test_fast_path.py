@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+import sys
+import os
+import json
+from datetime import datetime
+
+# Add the parent directory to the path to access modules
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from nlp.nlp import TaskExtractor
+from nlp.cache import ResultCache
+
+REFERENCE = datetime(2025, 1, 6, 9, 0)
+
+# Short texts with a date or time and no people or places
+RULES_TEXTS = ["gym workout at 6am tomorrow", "dentist appointment on Thursday at 3pm",
+               "yoga class at 7pm", "Team sync at 10am"]
+
+# Texts the rules must leave to the spaCy pipeline, and why
+SPACY_TEXTS = [
+    "buy milk",                                            # no date or time to anchor on
+    "call Ann regarding project update on Sunday at noon",  # a participant
+    "lunch at noon near the quad",                          # a location
+    "talk to mom tomorrow",                                 # a multi-word participant rule
+    "gym every week at 6am",                                # a repeating schedule
+    "review the slides and notes for the quarterly planning meeting tomorrow at 9am",  # too long
+]
+
+
+def _extractor():
+    # No cache, so every call really takes the path under test
+    return TaskExtractor(mode="fast", cache=ResultCache(capacity=0))
+
+
+def test_fast_path_or_fallback():
+    """Simple dated texts skip the parse; people, places and schedules fall back to it."""
+    extractor = _extractor()
+    for text in RULES_TEXTS:
+        assert extractor.extract_from_text(text, reference=REFERENCE)["extraction_path"] == "rules", text
+    for text in SPACY_TEXTS:
+        assert extractor.extract_from_text(text, reference=REFERENCE)["extraction_path"] == "spacy", text
+
+
+def test_fast_path_matches_full():
+    """The rules-only result is the one the full pipeline gives for the same text."""
+    extractor = _extractor()
+    for text in RULES_TEXTS:
+        fast = extractor.extract_from_text(text, mode="fast", reference=REFERENCE)
+        full = extractor.extract_from_text(text, mode="full", reference=REFERENCE)
+        fast.pop("extraction_path")
+        full.pop("extraction_path")
+        assert fast == full, text
+
+
+def test_fast_path_matches_full_on_input():
+    """Every task in input.json comes out the same whichever path it takes."""
+    with open(os.path.join(project_root, "input.json")) as f:
+        texts = [task["text"] for task in json.load(f)["tasks"]]
+    extractor = _extractor()
+    for text in texts:
+        fast = extractor.extract_from_text(text, mode="fast", reference=REFERENCE)
+        full = extractor.extract_from_text(text, mode="full", reference=REFERENCE)
+        fast.pop("extraction_path")
+        full.pop("extraction_path")
+        assert fast == full, text
+
+
+def main():
+    """Run the rules-only path checks."""
+    print("=== Fast Path Test ===")
+    test_fast_path_or_fallback()
+    test_fast_path_matches_full()
+    test_fast_path_matches_full_on_input()
+    print("All fast path checks passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+import sys
+import os
+import asyncio
+from datetime import datetime
+
+# Add the parent directory to the path to access modules
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from nlp.nlp import extract_entities_batch
+from services.executor import executor
+from services.jobs import JobManager
+
+REFERENCE = datetime(2025, 1, 6, 9, 0)
+
+TEXTS = ["gym workout at 6am tomorrow", "", "Meeting with John tomorrow at 2pm",
+         "dentist appointment on Friday at 3pm", "call mom", "team lunch at noon near the quad"] * 3
+
+
+async def _wait(job):
+    while not job.is_finished:
+        await asyncio.sleep(0.01)
+    return job
+
+
+async def _run_jobs():
+    manager = JobManager(concurrency=1, chunk_size=4, ttl=0)
+    first = manager.submit(texts=TEXTS, reference=REFERENCE)
+    second = manager.submit(texts=["call mom"], reference=REFERENCE)
+    third = manager.submit(texts=["call mom"], reference=REFERENCE)
+    # Only one job runs at a time, so the others are still queued
+    assert second.status == "queued"
+    manager.cancel(third.id)
+
+    await _wait(first)
+    await _wait(second)
+    return first, second, third
+
+
+def test_jobs_run_in_order_and_cancel():
+    original_pool_size = executor.pool_size
+    # Extract in a thread rather than starting worker processes
+    executor.pool_size = 0
+    try:
+        first, second, third = asyncio.run(_run_jobs())
+    finally:
+        executor.pool_size = original_pool_size
+
+    assert first.status == "completed" and second.status == "completed"
+    assert third.status == "cancelled" and third.results == []
+
+    expected = [text for text in TEXTS if text]
+    assert first.total == first.done == len(expected)
+    assert [record["index"] for record in first.results] == [i for i, text in enumerate(TEXTS) if text]
+    assert [record["extracted_entities"].to_dict() for record in first.results] == \
+        extract_entities_batch(expected, reference=REFERENCE)
+
+
+def main():
+    """Run the background job checks."""
+    print("=== Background Job Test ===")
+    test_jobs_run_in_order_and_cancel()
+    print("All job checks passed.")
+
+
+if __name__ == "__main__":
+    main()
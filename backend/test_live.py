@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+import sys
+import os
+import asyncio
+from datetime import datetime
+
+# Add the parent directory to the path to access modules
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import nlp.nlp as nlp_module
+from nlp.nlp import extract_entities
+from nlp.timescan import time_suffix_start
+from services.executor import executor
+from services.live import LiveSessions, preview_key
+from test_pipeline_calls import CountingPipeline
+
+REFERENCE = datetime(2025, 1, 6, 9, 0)
+
+
+def test_preview_key_ignores_trailing_punctuation():
+    assert preview_key("call mom") == preview_key("call mom ") == preview_key("call mom,")
+    assert preview_key("call mom t") != preview_key("call mom")
+    # The final "." turns "5 p.m" into a clock time
+    assert preview_key("meet Ann at 5 p.m") != preview_key("meet Ann at 5 p.m.")
+
+
+def test_time_suffix():
+    text = "lunch with Ann on Friday at noon"
+    assert text[time_suffix_start(text):] == "on Friday at noon"
+    # A date or time that is not led into by a preposition stays part of the text
+    assert time_suffix_start("call mom tomorrow") == len("call mom tomorrow")
+    assert time_suffix_start("meet Ann at 5 p.m") == len("meet Ann at 5 p.m")
+
+
+async def _type_edits():
+    sessions = LiveSessions(debounce_ms=20)
+    session_id, status, _ = await sessions.edit(None, "call mom", reference=REFERENCE)
+    assert status == "extracted"
+
+    # Two quick edits: the first is superseded by the second before it is extracted
+    first = asyncio.ensure_future(sessions.edit(session_id, "call mom at", reference=REFERENCE))
+    await asyncio.sleep(0)
+    assert sessions.pending() == 1
+    second = asyncio.ensure_future(sessions.edit(session_id, "call mom at 5pm", reference=REFERENCE))
+    superseded, latest = await first, await second
+
+    reused = await sessions.edit(session_id, "call mom at 5pm, ", reference=REFERENCE)
+
+    await sessions.edit(session_id, "meet Ann at 5 p.m", reference=REFERENCE)
+    completed = await sessions.edit(session_id, "meet Ann at 5 p.m.", reference=REFERENCE)
+    assert sessions.pending() == 0
+    return superseded, latest, reused, completed
+
+
+def test_edits_supersede_and_reuse():
+    original_pool_size = executor.pool_size
+    # Extract in a thread rather than starting worker processes
+    executor.pool_size = 0
+    try:
+        superseded, latest, reused, completed = asyncio.run(_type_edits())
+    finally:
+        executor.pool_size = original_pool_size
+
+    assert superseded[1:] == ("superseded", None)
+    assert latest[1:] == ("extracted", extract_entities("call mom at 5pm", reference=REFERENCE))
+    assert reused[1] == "reused" and reused[2] == latest[2]
+    assert completed[1] == "extracted" and completed[2]["time"] == "17:00"
+
+
+async def _retype_times(edits):
+    sessions = LiveSessions(debounce_ms=0)
+    session_id, status, _ = await sessions.edit(None, edits[0], reference=REFERENCE)
+    assert status == "extracted"
+    return [await sessions.edit(session_id, text, reference=REFERENCE) for text in edits[1:]]
+
+
+def test_time_edits_skip_the_parse():
+    """Changing only the date and time at the end of the text re-resolves them without a new parse."""
+    edits = ["lunch with Ann at 5pm", "lunch with Ann at 6pm", "lunch with Ann at 6:30pm",
+             "lunch with Ann at 6:30pm tomorrow", "lunch with Ann on Friday at 7pm"]
+    original_pool_size = executor.pool_size
+    original_pipeline = nlp_module.nlp
+    counter = CountingPipeline(original_pipeline)
+    executor.pool_size = 0
+    nlp_module.extractor.cache.clear()
+    nlp_module.nlp = counter
+    try:
+        retimed = asyncio.run(_retype_times(edits))
+    finally:
+        nlp_module.nlp = original_pipeline
+        executor.pool_size = original_pool_size
+
+    assert counter.calls + counter.piped == 1
+    for text, (_, status, result) in zip(edits[1:], retimed):
+        assert status == "retimed", text
+        assert result == extract_entities(text, reference=REFERENCE), text
+
+
+def main():
+    """Run the live preview checks."""
+    print("=== Live Preview Test ===")
+    test_preview_key_ignores_trailing_punctuation()
+    test_time_suffix()
+    test_edits_supersede_and_reuse()
+    test_time_edits_skip_the_parse()
+    print("All live preview checks passed.")
+
+
+if __name__ == "__main__":
+    main()
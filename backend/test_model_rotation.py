@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+import sys
+import os
+
+# Add the parent directory to the path to access modules
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import asyncio
+from nlp.model import ModelManager, vocab_size
+from services.executor import ExtractionExecutor
+from utils.metrics import registry
+
+
+def test_vocab_growth_rotates_the_model():
+    """Past the growth limit a fresh model is loaded and handed out exactly once."""
+    manager = ModelManager(max_growth=50)
+    old = manager.pipeline
+    assert manager.check() is None
+
+    old(" ".join(f"zqx{i}" for i in range(100)))
+    assert manager.growth() > 50
+    assert manager.check() is None
+    manager._loader.join()
+
+    fresh = manager.check()
+    assert fresh is not None and fresh is not old
+    assert manager.check() is None
+    assert manager.pipeline is fresh
+    assert manager.rotations == 1
+    assert vocab_size(fresh)[0] < vocab_size(old)[0]
+    assert manager.stats()["growth"] == 0
+
+
+def test_worker_vocab_is_reported():
+    """Pool workers ship their vocab stats back with each batch."""
+    import services.executor as executor_module
+    pool = ExtractionExecutor(pool_size=1)
+    default, executor_module.executor = executor_module.executor, pool
+    try:
+        asyncio.run(pool.extract_batch(["buy zqxmilk tomorrow"]))
+        workers = pool.model_stats()
+        assert len(workers) == 1 and workers[0]["pid"] != os.getpid()
+        worker = workers[0]
+        assert f'nlp_vocab_strings{{pid="{worker["pid"]}"}} {worker["strings"]}' in registry.render()
+    finally:
+        executor_module.executor = default
+        pool.shutdown()
+
+
+def main():
+    """Run the model rotation checks."""
+    print("=== Model Rotation Test ===")
+    test_vocab_growth_rotates_the_model()
+    test_worker_vocab_is_reported()
+    print("All model rotation checks passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+import sys
+import os
+import json
+import stat
+import tempfile
+
+# Add the parent directory to the path to access modules
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from services.persistence import ResultWriter
+
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_snapshot_keeps_file_permissions():
+    """Replacing the snapshot keeps the target's mode instead of mkstemp's 0600."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "output.json")
+        writer = ResultWriter(mode="overwrite", path=path)
+
+        umask = os.umask(0o022)
+        try:
+            writer._write_snapshot([{"original_text": "a"}])
+        finally:
+            os.umask(umask)
+        assert _mode(path) == 0o644
+
+        os.chmod(path, 0o640)
+        writer._write_snapshot([{"original_text": "b"}])
+        assert _mode(path) == 0o640
+        with open(path) as f:
+            assert json.load(f) == {"results": [{"original_text": "b"}]}
+
+
+def main():
+    """Run the result persistence checks."""
+    print("=== Persistence Test ===")
+    test_snapshot_keeps_file_permissions()
+    print("All persistence checks passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+import sys
+import os
+import time
+from spacy.tokens import Doc
+
+# Add the parent directory to the path to access modules
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import nlp.nlp as nlp_module
+
+# Inputs with several "at/in/by/near" phrases, which used to trigger one
+# extra pipeline run per location candidate
+SAMPLE_TASKS = [
+    "dentist appointment on Thursday at 3pm",
+    "Meet John and Ashley at the conference room at 3PM",
+    "Lunch with Tim and Sarah at Cafe Nero at noon",
+    "Coffee with Sarah at Starbucks on Wednesday morning",
+    "study in the library near the quad by the fountain at 7pm",
+    "Drive to Chicago with Ashley from 10AM to 4PM",
+    "review notes in Siebel near the lab around the corner by 5pm",
+]
+
+
+class CountingPipeline:
+    """Wraps the spaCy pipeline and counts how often it is invoked."""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.calls = 0
+        self.piped = 0
+
+    def __call__(self, text, *args, **kwargs):
+        self.calls += 1
+        return self.pipeline(text, *args, **kwargs)
+
+    def pipe(self, texts, *args, **kwargs):
+        for doc in self.pipeline.pipe(texts, *args, **kwargs):
+            self.piped += 1
+            yield doc
+
+    def __getattr__(self, name):
+        return getattr(self.pipeline, name)
+
+
+def count_pipeline_calls(func, *args, **kwargs):
+    """Run func with the module pipeline wrapped and return (counter, seconds)."""
+    original = nlp_module.nlp
+    counter = CountingPipeline(original)
+    # Cached results would skip the pipeline entirely
+    nlp_module.extractor.cache.clear()
+    nlp_module.nlp = counter
+    try:
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+    finally:
+        nlp_module.nlp = original
+    return counter, elapsed
+
+
+def test_single_pipeline_call_per_text():
+    """Each extraction must parse its input exactly once."""
+    for text in SAMPLE_TASKS:
+        counter, elapsed = count_pipeline_calls(nlp_module.extract_entities, text, mode="full")
+        print(f"{elapsed * 1000:7.2f} ms  {counter.calls} call(s)  '{text}'")
+        assert counter.calls == 1, f"'{text}' ran the pipeline {counter.calls} times"
+
+
+def test_batch_pipes_each_text_once():
+    """Batch extraction must parse every input once, through nlp.pipe only."""
+    counter, elapsed = count_pipeline_calls(nlp_module.extract_entities_batch, SAMPLE_TASKS, mode="full")
+    print(f"Batch of {len(SAMPLE_TASKS)}: {elapsed * 1000:.2f} ms")
+    assert counter.calls == 0
+    assert counter.piped == len(SAMPLE_TASKS)
+
+
+def test_batch_parses_repeated_texts_once():
+    """Texts repeated within a batch (up to whitespace) are parsed once and fanned back out."""
+    texts = SAMPLE_TASKS + [f"  {text}" for text in SAMPLE_TASKS] + SAMPLE_TASKS[:3]
+    results = []
+    counter, _ = count_pipeline_calls(
+        lambda: results.extend(nlp_module.extract_entities_batch(texts, mode="full")))
+    assert counter.piped == len(SAMPLE_TASKS)
+    assert len(results) == len(texts)
+    for i, text in enumerate(texts):
+        assert results[i] == results[SAMPLE_TASKS.index(text.strip())]
+    # Duplicates get their own copy of the result
+    assert results[0]["participants"] is not results[len(SAMPLE_TASKS)]["participants"]
+
+
+def test_segmented_paragraph_is_parsed_once():
+    """Segment mode splits a paragraph into tasks from a single parse."""
+    paragraph = "dentist Thursday at 3pm. Call Ann on Sunday at noon. Gym tomorrow 6am"
+    results = []
+    counter, _ = count_pipeline_calls(
+        lambda: results.extend(nlp_module.extract_entities(paragraph, mode="segment")))
+    assert counter.calls == 1
+    assert [task["text"] for task in results] == ["dentist Thursday at 3pm", "Call Ann on Sunday at noon",
+                                                  "Gym tomorrow 6am"]
+    assert all(paragraph[task["start"]:task["end"]] == task["text"] for task in results)
+    assert results[0]["time"] == "15:00" and results[1]["time"] == "12:00" and results[2]["time"] == "06:00"
+    assert "Ann" in results[1]["participants"] and "Ann" not in results[0]["participants"]
+
+
+def test_two_token_candidate_text():
+    """Without a noun chunk, the two tokens after a preposition are joined with a space, as before."""
+    doc = Doc(nlp_module.nlp.vocab, words=["dinner", "near", "Joe", "'s"], spaces=[True, True, False, False],
+              pos=["NOUN", "ADP", "ADJ", "PART"], deps=["ROOT", "prep", "amod", "pobj"], heads=[0, 0, 3, 1])
+    extracted = nlp_module.extractor._new_result("spacy")
+    nlp_module.extractor._extract_locations(doc, extracted)
+    assert extracted["locations"] == ["Joe 's"]
+
+
+def main():
+    """Run the pipeline invocation checks and display timings."""
+    print("=== Pipeline Invocation Regression Test ===")
+    test_single_pipeline_call_per_text()
+    test_batch_pipes_each_text_once()
+    test_batch_parses_repeated_texts_once()
+    test_segmented_paragraph_is_parsed_once()
+    test_two_token_candidate_text()
+    print("All extractions ran the pipeline once per input.")
+
+
+if __name__ == "__main__":
+    main()
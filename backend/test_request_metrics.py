@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+import sys
+import os
+import asyncio
+
+# Add the parent directory to the path to access modules
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from utils.request_metrics import RequestMetricsMiddleware, REQUESTS, REQUEST_SECONDS
+
+RECORDS = 1000
+
+
+def _streaming_app(produced):
+    app = FastAPI()
+    app.add_middleware(RequestMetricsMiddleware)
+
+    @app.get("/stream")
+    async def stream():
+        async def records():
+            for i in range(RECORDS):
+                produced.append(i)
+                yield f'{{"index": {i}}}\n'
+        return StreamingResponse(records(), media_type="application/x-ndjson")
+
+    return app
+
+
+async def _read_slowly(app, produced):
+    """Read one body chunk, then stall like a client that stopped reading."""
+    scope = {"type": "http", "method": "GET", "path": "/stream", "raw_path": b"/stream", "root_path": "",
+             "scheme": "http", "query_string": b"", "headers": [], "client": ("test", 1), "server": ("test", 80),
+             "http_version": "1.1", "asgi": {"version": "3.0"}}
+    first_chunk = asyncio.Event()
+    stalled = asyncio.Event()
+    chunks = []
+
+    async def receive():
+        await stalled.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            chunks.append(message["body"])
+            first_chunk.set()
+            await stalled.wait()
+
+    task = asyncio.ensure_future(app(scope, receive, send))
+    await asyncio.wait_for(first_chunk.wait(), 5)
+    await asyncio.sleep(0.2)
+    in_flight = len(produced)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    return in_flight, chunks
+
+
+def test_slow_client_holds_back_the_stream():
+    """A client that stops reading stops the generator instead of having every record buffered."""
+    produced = []
+    in_flight, chunks = asyncio.run(_read_slowly(_streaming_app(produced), produced))
+    assert len(chunks) == 1
+    assert in_flight < 10
+
+
+def test_streamed_request_is_recorded_at_its_end():
+    from fastapi.testclient import TestClient
+    produced = []
+    before = REQUESTS.value(method="GET", route="/stream", status=200)
+    response = TestClient(_streaming_app(produced)).get("/stream")
+    assert len(response.text.splitlines()) == RECORDS
+    assert REQUESTS.value(method="GET", route="/stream", status=200) == before + 1
+    assert "http_request_duration_seconds_count{method=\"GET\",route=\"/stream\"}" in "".join(REQUEST_SECONDS.render())
+
+
+def main():
+    """Run the request metrics middleware checks."""
+    print("=== Request Metrics Test ===")
+    test_slow_client_holds_back_the_stream()
+    test_streamed_request_is_recorded_at_its_end()
+    print("All request metrics checks passed.")
+
+
+if __name__ == "__main__":
+    main()
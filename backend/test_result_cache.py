@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+import sys
+import os
+import time
+import tempfile
+from datetime import datetime, timedelta
+
+# Add the parent directory to the path to access modules
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from nlp.cache import ResultCache, DiskCache, cache_key, CACHE_EVICTIONS, CACHE_EXPIRATIONS
+
+SAMPLE_RESULT = {
+    "task": "Gym workout",
+    "participants": [],
+    "date": "2025-01-02",
+    "time": "06:00",
+    "end_time": None,
+    "locations": []
+}
+
+
+def test_returns_copies():
+    """Mutating a returned result must not change the cached entry."""
+    cache = ResultCache(capacity=4, ttl=0)
+    key = cache_key("gym workout at 6am tomorrow", datetime(2025, 1, 1, 9), "full")
+    cache.put(key, SAMPLE_RESULT)
+
+    first = cache.get(key)
+    first["participants"].append("Ann")
+    first["task"] = "Changed"
+
+    second = cache.get(key)
+    assert second == SAMPLE_RESULT
+
+
+def test_key_changes_at_midnight():
+    """The same text on a different reference day is a different entry."""
+    evening = datetime(2025, 1, 1, 23, 59)
+    morning = evening + timedelta(minutes=2)
+    assert cache_key("gym  workout tomorrow", evening, "full") == cache_key("gym workout tomorrow ", evening, "full")
+    assert cache_key("gym workout tomorrow", evening, "full") != cache_key("gym workout tomorrow", morning, "full")
+
+
+def test_duration_key_holds_the_minute():
+    """A duration resolves against the time of day, so its key changes within a day."""
+    morning = datetime(2025, 1, 1, 9)
+    afternoon = datetime(2025, 1, 1, 15)
+    assert cache_key("gym in 2 hours", morning, "full") != cache_key("gym in 2 hours", afternoon, "full")
+    assert cache_key("gym in 2 hours", morning, "full") == cache_key("gym in 2 hours", morning.replace(second=30), "full")
+    assert cache_key("gym at 6pm", morning, "full") == cache_key("gym at 6pm", afternoon, "full")
+
+
+def test_lru_eviction_and_ttl():
+    """Least recently used entries are evicted first; expired ones are dropped."""
+    evictions, expirations = CACHE_EVICTIONS.value(), CACHE_EXPIRATIONS.value()
+    cache = ResultCache(capacity=2, ttl=0)
+    cache.put("a", SAMPLE_RESULT)
+    cache.put("b", SAMPLE_RESULT)
+    cache.get("a")
+    cache.put("c", SAMPLE_RESULT)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert CACHE_EVICTIONS.value() == evictions + 1
+
+    expiring = ResultCache(capacity=2, ttl=0.01)
+    expiring.put("a", SAMPLE_RESULT)
+    time.sleep(0.02)
+    assert expiring.get("a") is None
+    assert CACHE_EXPIRATIONS.value() == expirations + 1
+
+
+def test_disabled_cache():
+    cache = ResultCache(capacity=0)
+    cache.put("a", SAMPLE_RESULT)
+    assert cache.get("a") is None
+    assert not cache.enabled
+
+
+def test_disk_hits_do_not_write():
+    """A disk hit's last use is kept in memory and saved with the next put."""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DiskCache(os.path.join(tmp, "cache.db"), "test")
+        key = cache_key("gym workout at 6am tomorrow", datetime(2025, 1, 1, 9), "full")
+        store.put(key, SAMPLE_RESULT)
+        connection = store._connect()
+        connection.execute("UPDATE results SET used_at = 0")
+
+        def used_at():
+            return connection.execute("SELECT used_at FROM results WHERE key = ?", (store._hash(key),)).fetchone()[0]
+
+        assert store.get(key) == SAMPLE_RESULT
+        assert used_at() == 0
+        store.put(("other", "2025-01-01", "full"), SAMPLE_RESULT)
+        assert used_at() > 0
+
+
+def test_fingerprint_follows_rules_version():
+    """Editing the extraction code keeps the disk cache; bumping RULES_VERSION invalidates it."""
+    import nlp.nlp as nlp_module
+
+    fingerprint = nlp_module.model_fingerprint()
+    assert nlp_module.model_fingerprint() == fingerprint
+    original_version = nlp_module.RULES_VERSION
+    nlp_module.RULES_VERSION += 1
+    try:
+        assert nlp_module.model_fingerprint() != fingerprint
+    finally:
+        nlp_module.RULES_VERSION = original_version
+
+
+def main():
+    """Run the result cache checks."""
+    print("=== Result Cache Test ===")
+    test_returns_copies()
+    test_key_changes_at_midnight()
+    test_duration_key_holds_the_minute()
+    test_lru_eviction_and_ttl()
+    test_disabled_cache()
+    test_disk_hits_do_not_write()
+    test_fingerprint_follows_rules_version()
+    print("All result cache checks passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+import sys
+import os
+import asyncio
+from datetime import datetime
+
+# Add the parent directory to the path to access modules
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from services.singleflight import SingleFlight
+
+REFERENCE = datetime(2025, 1, 6, 9, 0)
+
+
+class SlowBatch:
+    """Stands in for the micro-batcher: records every batch and takes a while to answer."""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    async def __call__(self, texts, mode, reference):
+        self.batches.append(list(texts))
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("extraction failed")
+        return [{"task": text, "participants": []} for text in texts]
+
+
+async def _herd(run_batch, requests):
+    flight = SingleFlight(run_batch)
+    results = await asyncio.gather(*(flight.submit(texts, "full", REFERENCE) for texts in requests),
+                                   return_exceptions=True)
+    return flight, results
+
+
+def test_identical_requests_share_one_extraction():
+    run_batch = SlowBatch()
+    requests = [["Team sync at 10am", f"task {i}"] for i in range(50)]
+    flight, results = asyncio.run(_herd(run_batch, requests))
+
+    # The shared text is extracted by the first request only
+    assert run_batch.batches[0] == ["Team sync at 10am", "task 0"]
+    assert all(batch == [f"task {i}"] for i, batch in enumerate(run_batch.batches[1:], 1))
+    assert flight.coalesced == 49
+    [(label, waiters)] = flight.stats()["hot_keys"]
+    assert waiters == 49 and len(label) == 12 and "sync" not in label
+    assert flight.stats()["in_flight"] == 0
+
+    assert all(result[0] == {"task": "Team sync at 10am", "participants": []} for result in results)
+    # Waiters get their own copy of the shared result
+    assert results[1][0]["participants"] is not results[0][0]["participants"]
+
+
+def test_waiters_get_the_error():
+    flight, results = asyncio.run(_herd(SlowBatch(fail=True), [["call mom"]] * 3))
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.stats()["in_flight"] == 0
+
+
+def main():
+    """Run the single-flight checks."""
+    print("=== Single-Flight Test ===")
+    test_identical_requests_share_one_extraction()
+    test_waiters_get_the_error()
+    print("All single-flight checks passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+import sys
+import os
+import io
+import json
+import tempfile
+from datetime import datetime
+
+# Add the parent directory to the path to access modules
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import nlp.taskio as taskio
+from nlp.taskio import iter_tasks, last_completed_index
+
+REFERENCE = datetime(2025, 1, 6, 9, 0)
+
+TEXTS = ["gym workout at 6am tomorrow", "", "Meeting with John tomorrow at 2pm",
+         "dentist appointment on Friday at 3pm", "call mom", "team lunch at noon near the quad"] * 3
+
+
+def test_json_tasks_are_read_incrementally():
+    """Entries split across read chunks are still decoded one by one."""
+    tasks = [{"text": f"gym workout at {i % 12 + 1}am tomorrow"} for i in range(50)]
+    document = json.dumps({"source": "backfill", "tasks": tasks}, indent=4)
+
+    original_chunk_size = taskio.READ_CHUNK_SIZE
+    taskio.READ_CHUNK_SIZE = 7
+    try:
+        read = list(iter_tasks(io.StringIO(document), "json"))
+    finally:
+        taskio.READ_CHUNK_SIZE = original_chunk_size
+
+    assert read == [(i, task["text"]) for i, task in enumerate(tasks)]
+
+
+def test_jsonl_tasks():
+    lines = '{"text": "dentist on Thursday at 3pm"}\n\n"call Ann at noon"\n{"other": 1}\n'
+    assert list(iter_tasks(io.StringIO(lines), "jsonl")) == [
+        (0, "dentist on Thursday at 3pm"),
+        (1, "call Ann at noon"),
+        (2, ""),
+    ]
+
+
+def test_resume_truncates_partial_line():
+    """A half-written record from a crash is dropped and the last full one is reported."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "out.jsonl")
+        assert last_completed_index(path) == -1
+
+        with open(path, "w") as f:
+            f.write('{"index": 0, "original_text": "a"}\n{"index": 3, "original_text": "b"}\n{"index": 4, "orig')
+        assert last_completed_index(path) == 3
+        with open(path) as f:
+            assert f.read().endswith('"b"}\n')
+
+        with open(path, "w") as f:
+            f.write('{"index": 0, "or')
+        assert last_completed_index(path) == -1
+        assert os.path.getsize(path) == 0
+
+
+def test_stream_resumes_after_truncated_line():
+    """A run interrupted mid-record picks up where it stopped and ends with the same output."""
+    from nlp.nlp import process_input_stream
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "tasks.jsonl")
+        with open(input_path, "w") as f:
+            f.write("".join(json.dumps({"text": text}) + "\n" for text in TEXTS))
+
+        full_path = os.path.join(tmp, "full.jsonl")
+        assert process_input_stream(input_path, full_path, resume=False, batch_size=4, reference=REFERENCE)
+        with open(full_path) as f:
+            full = f.read()
+        records = [json.loads(line) for line in full.splitlines()]
+        assert [record["index"] for record in records] == [i for i, text in enumerate(TEXTS) if text]
+        assert records[0]["extracted_entities"]["date"] == "2025-01-07"
+
+        # A crash after five records, halfway through writing the sixth
+        lines = full.splitlines(keepends=True)
+        resumed_path = os.path.join(tmp, "resumed.jsonl")
+        with open(resumed_path, "w") as f:
+            f.write("".join(lines[:5]) + lines[5][:20])
+        assert process_input_stream(input_path, resumed_path, batch_size=4, reference=REFERENCE)
+        with open(resumed_path) as f:
+            assert f.read() == full
+
+
+
+def main():
+    """Run the streaming task file checks."""
+    print("=== Task Stream Test ===")
+    test_json_tasks_are_read_incrementally()
+    test_jsonl_tasks()
+    test_resume_truncates_partial_line()
+    test_stream_resumes_after_truncated_line()
+    print("All task stream checks passed.")
+
+
+if __name__ == "__main__":
+    main()
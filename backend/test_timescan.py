@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+import sys
+import os
+
+# Add the parent directory to the path to access modules
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from nlp.timescan import scan_time_spans, spans_by_priority, clock_texts
+
+
+def _best(text, kind):
+    spans = spans_by_priority(scan_time_spans(text), kind)
+    return spans[0] if spans else None
+
+
+def test_time_precedence():
+    """A range wins over a clock time, and a clock time over noon or midnight, wherever they appear."""
+    assert _best("gym at noon from 9am to 10am", "range").value == "09:00"
+    assert _best("gym at noon from 9am to 10am", "range").end_value == "10:00"
+    assert _best("lunch at noon or 1pm", "time").value == "13:00"
+    assert _best("dinner at midnight or 7pm", "time").value == "19:00"
+    assert _best("run at 6pm for 2 hours", "time").text == "6pm"
+    assert _best("sleep at midnight or noon", "time").value == "12:00"
+
+
+def test_range_forms():
+    assert _best("meet 3pm to 4:30pm", "range").end_value == "16:30"
+    assert _best("call between 1pm and 2pm", "range").value == "13:00"
+    assert _best("from 9am to 10am or 3pm to 4pm", "range").text == "from 9am to 10am"
+    assert clock_texts(scan_time_spans("between 1pm and 2pm at 3pm")) == ["1pm", "2pm", "3pm"]
+
+
+def test_date_precedence():
+    """A relative weekday wins over a bare weekday, even when it comes later."""
+    assert _best("call on friday, next monday", "date").text == "next monday"
+    assert _best("tomorrow or friday", "date").text == "friday"
+    assert _best("today or tomorrow", "date").text == "tomorrow"
+    # The weekday inside "next friday" is also found on its own
+    assert [span.text for span in scan_time_spans("party next friday")] == ["next friday", "friday"]
+
+
+def test_clock_forms():
+    assert _best("meet Ann at 5 p.m.", "time").value == "17:00"
+    assert _best("standup at 12am", "time").value == "00:00"
+    assert _best("review at 12:15pm", "time").value == "12:15"
+    # A duration is left for dateparser to resolve
+    assert _best("run 2 hours today", "time").value is None
+    assert scan_time_spans("meet Ann at 5 p.m") == []
+
+
+def main():
+    """Run the time scanner checks."""
+    print("=== Time Scan Test ===")
+    test_time_precedence()
+    test_range_forms()
+    test_date_precedence()
+    test_clock_forms()
+    print("All time scan checks passed.")
+
+
+if __name__ == "__main__":
+    main()
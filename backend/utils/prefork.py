@@ -0,0 +1,205 @@
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import time
+import uvicorn
+from utils.metrics import registry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds between memory reports from the master (0 only reports on SIGUSR1 and respawns)
+MEMORY_REPORT_INTERVAL = float(os.getenv("NLP_MEMORY_REPORT_INTERVAL", "300"))
+
+# Fields of /proc/<pid>/smaps_rollup that make up the memory report
+_SMAPS_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared_clean",
+    "Shared_Dirty": "shared_dirty",
+    "Private_Clean": "private_clean",
+    "Private_Dirty": "private_dirty",
+}
+
+
+def memory_usage(pid="self"):
+    """
+    Resident memory of a process in bytes, split into pages shared with
+    other processes (such as the model pages inherited from the master) and
+    pages private to it. Returns an empty dict when /proc is unavailable.
+    """
+    usage = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in _SMAPS_FIELDS:
+                    usage[_SMAPS_FIELDS[name]] = int(rest.split()[0]) * 1024
+    except OSError:
+        # Kernels before 4.14 only have the page counts of statm
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                _, resident, shared = (int(value) for value in f.read().split()[:3])
+        except OSError:
+            return {}
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        return {"rss": resident * page_size, "shared": shared * page_size,
+                "private": (resident - shared) * page_size}
+
+    usage["shared"] = usage.pop("shared_clean", 0) + usage.pop("shared_dirty", 0)
+    usage["private"] = usage.pop("private_clean", 0) + usage.pop("private_dirty", 0)
+    return usage
+
+
+def _format_usage(usage):
+    return ", ".join(f"{kind} {value / 2 ** 20:.1f} MiB" for kind, value in usage.items())
+
+
+registry.gauge("process_memory_bytes", "Resident memory of this process by kind (rss, pss, shared, private)",
+               labels=("kind",), callback=lambda: {(kind,): value for kind, value in memory_usage().items()})
+
+
+class PreforkServer:
+    """
+    Runs the app in several worker processes forked from one master.
+    The master imports the app (which loads the spaCy model), warms it up,
+    freezes the heap with gc.freeze() so the garbage collector does not
+    touch the model's objects, and then forks. Workers share the model
+    pages copy-on-write and accept connections from one listening socket.
+    A worker that has served max_requests requests (plus some jitter, so
+    they do not all restart together) shuts down gracefully and the master
+    forks a replacement.
+    """
+
+    def __init__(self, app, host="127.0.0.1", port=8080, workers=2, max_requests=0, max_requests_jitter=None,
+                 warm_up=None):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests // 10 if max_requests_jitter is None else max_requests_jitter
+        self.warm_up = warm_up
+        self._children = {}
+        self._socket = None
+        self._stopping = False
+        self._report_requested = False
+
+    def run(self):
+        if self.warm_up is not None:
+            self.warm_up()
+        # Anything recorded while warming up would otherwise be counted once per worker
+        registry.drain()
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self._socket.listen(2048)
+        self._socket.set_inheritable(True)
+
+        # Objects that exist now are never collected, so the collector does not
+        # write to (and un-share) the pages holding them
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGUSR1, self._handle_report)
+
+        logger.info(f"Master {os.getpid()} listening on http://{self.host}:{self.port} "
+                    f"with {self.workers} workers ({_format_usage(memory_usage())})")
+        for _ in range(self.workers):
+            self._spawn()
+        try:
+            self._supervise()
+        finally:
+            self._stop_children()
+            self._socket.close()
+
+    def memory_report(self):
+        """Memory usage of every worker, keyed by pid."""
+        return {pid: memory_usage(pid) for pid in self._children}
+
+    def _spawn(self):
+        limit = self.max_requests
+        if limit and self.max_requests_jitter:
+            limit += random.randint(0, self.max_requests_jitter)
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(limit)
+        self._children[pid] = time.monotonic()
+        logger.info(f"Started worker {pid}" + (f" (recycled after {limit} requests)" if limit else ""))
+
+    def _run_worker(self, limit):
+        exit_code = 0
+        try:
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+                signal.signal(sig, signal.SIG_DFL)
+            config = uvicorn.Config(self.app, limit_max_requests=limit or None)
+            uvicorn.Server(config).run(sockets=[self._socket])
+        except BaseException as e:
+            logger.error(f"Worker {os.getpid()} failed: {e}")
+            exit_code = 1
+        finally:
+            # Skip the master's atexit handlers and finalizers
+            os._exit(exit_code)
+
+    def _supervise(self):
+        next_report = time.monotonic() + MEMORY_REPORT_INTERVAL if MEMORY_REPORT_INTERVAL else None
+        while not self._stopping:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid and pid in self._children:
+                del self._children[pid]
+                if not self._stopping:
+                    code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+                    logger.info(f"Worker {pid} exited with code {code}, starting a replacement")
+                    self._spawn()
+                    self._report_requested = True
+                continue
+
+            if self._report_requested or (next_report is not None and time.monotonic() >= next_report):
+                self._report_requested = False
+                if next_report is not None:
+                    next_report = time.monotonic() + MEMORY_REPORT_INTERVAL
+                self._log_memory_report()
+            time.sleep(0.5)
+
+    def _log_memory_report(self):
+        now = time.monotonic()
+        for pid, usage in self.memory_report().items():
+            uptime = now - self._children.get(pid, now)
+            logger.info(f"Worker {pid} (up {uptime:.0f}s): {_format_usage(usage)}")
+
+    def _stop_children(self, timeout=30):
+        """Ask every worker to finish its in-flight requests, then wait for it."""
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self._children.pop(pid, None)
+        deadline = time.monotonic() + timeout
+        while self._children and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self._children.pop(pid, None)
+            else:
+                time.sleep(0.1)
+        for pid in self._children:
+            logger.warning(f"Worker {pid} did not stop in time, killing it")
+            os.kill(pid, signal.SIGKILL)
+        self._children.clear()
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _handle_report(self, signum, frame):
+        self._report_requested = True
@@ -0,0 +1,53 @@
+import time
+from utils.metrics import registry
+
+REQUEST_SECONDS = registry.histogram("http_request_duration_seconds", "Request latency per route",
+                                     labels=("method", "route"))
+REQUESTS = registry.counter("http_requests_total", "Requests per route and status code",
+                            labels=("method", "route", "status"))
+
+
+class RequestMetricsMiddleware:
+    """
+    Records the latency and status code of every HTTP request, per route.
+    A plain ASGI middleware that only wraps send: @app.middleware("http")
+    copies the response through an unbounded queue, which runs a streamed
+    response to completion however slowly the client reads it. Latency is
+    measured up to the last body message, so streamed responses are timed
+    in full rather than up to their headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        recorded = False
+
+        def record():
+            nonlocal recorded
+            recorded = True
+            # Label by route template rather than raw path to keep the series bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - start, method=scope["method"], route=route)
+            REQUESTS.inc(method=scope["method"], route=route, status=status)
+
+        async def send_and_record(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            # A request that failed or was cancelled before its last body message still counts
+            if not recorded:
+                record()
@@ -0,0 +1,38 @@
+import json
+from dataclasses import is_dataclass
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    # Optional: without orjson the standard library encoder is used
+    orjson = None
+
+
+def json_default(obj):
+    """Encode the objects the standard json module does not know, such as ExtractedTask."""
+    to_dict = getattr(obj, "to_dict", None)
+    if to_dict is not None:
+        return to_dict()
+    if is_dataclass(obj):
+        return {name: getattr(obj, name) for name in obj.__dataclass_fields__}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """Serialize obj to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=json_default)
+    return json.dumps(obj, default=json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response that serializes its content directly with dumps(),
+    skipping FastAPI's jsonable_encoder pass over every nested value.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)